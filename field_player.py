@@ -282,6 +282,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Do not start the web API server process.",
     )
+    parser.add_argument(
+        "--watch_catalogs",
+        action="store_true",
+        help="Watch content folders and apply new, changed and removed files to the catalogs while playing.",
+    )
     args = parser.parse_args()
 
     if args.verbose:
@@ -321,6 +326,17 @@ if __name__ == "__main__":
         api_commands_queue = None
         api_proc = None
 
+    if args.watch_catalogs:
+        from fs42.catalog_watcher import CatalogWatcher
+
+        if api_commands_queue is None:
+            api_commands_queue = multiprocessing.Queue()
+        # changes are signaled through the same command queue the web api uses
+        watcher = CatalogWatcher(
+            StationManager().stations, on_reload=lambda: api_commands_queue.put({"command": "reload_data"})
+        )
+        watcher.start()
+
     osd_dir = Path(__file__).resolve().parent / "fs42" / "osd"
     overlay_proc = subprocess.Popen([sys.executable, osd_dir / "fsx_overlay.py"])
     menu_proc = subprocess.Popen([sys.executable, osd_dir / "fsx_menu.py"])
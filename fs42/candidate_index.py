@@ -0,0 +1,94 @@
+import random
+from bisect import bisect_left, insort
+
+from fs42.hint_mask import HintMask
+from fs42.media_processor import MediaProcessor
+
+
+class CandidateIndex:
+    """
+    One tag's catalog entries bucketed by play count, each bucket sorted by duration. A "least played
+    and shorter than seconds" lookup walks the buckets from the lowest count and bisects each one to
+    the entries that fit, so find_candidate never scans the whole tag. Entries keep their catalog
+    position so ties resolve exactly like a scan of the tag list would. Play counts must change through
+    increment so the buckets stay in step.
+    """
+
+    def __init__(self, entries):
+        self.source = entries
+        self.size = len(entries)
+        self.entries = entries
+        # id(entry) -> catalog position
+        self.positions = {id(entry): i for i, entry in enumerate(entries)}
+        # count -> sorted [(duration, position)], plus the sorted list of counts in use
+        self.buckets = {}
+        for i, entry in enumerate(entries):
+            self.buckets.setdefault(entry.count, []).append((entry.duration, i))
+        for bucket in self.buckets.values():
+            bucket.sort()
+        self.counts = sorted(self.buckets.keys())
+        # hints compiled to bit masks, None falls back to testing the hints themselves
+        self.masks = [HintMask.compile(entry.hints) for entry in entries]
+
+    def is_current(self, entries) -> bool:
+        # the tag list is replaced or appended to while a catalog builds - rebuild when that happens
+        return entries is self.source and len(entries) == self.size
+
+    def pick_lowest(self, seconds, when):
+        """The least played entry shorter than seconds whose hints allow when - random among ties"""
+        (hour, day, midnight) = (when.hour, HintMask.day_index(when), HintMask.is_midnight(when))
+        for count in self.counts:
+            bucket = self.buckets[count]
+            # zero (or near zero) durations are likely not valid, so start at one second
+            lo = bisect_left(bucket, (1, -1))
+            hi = bisect_left(bucket, (seconds, -1))
+            lowest = []
+            for _duration, i in bucket[lo:hi]:
+                mask = self.masks[i]
+                if mask is not None:
+                    if mask.allows_at(hour, day, midnight):
+                        lowest.append(i)
+                elif MediaProcessor._test_candidate_hints(self.entries[i].hints, when):
+                    lowest.append(i)
+            if len(lowest):
+                lowest.sort()
+                return random.choice([self.entries[i] for i in lowest])
+        return None
+
+    def eligible(self, seconds, when, limit):
+        """Up to limit entries shorter than seconds whose hints allow when - least played first, shuffled among ties"""
+        (hour, day, midnight) = (when.hour, HintMask.day_index(when), HintMask.is_midnight(when))
+        found = []
+        for count in self.counts:
+            bucket = self.buckets[count]
+            lo = bisect_left(bucket, (1, -1))
+            hi = bisect_left(bucket, (seconds, -1))
+            tier = []
+            for _duration, i in bucket[lo:hi]:
+                mask = self.masks[i]
+                if mask is not None:
+                    if mask.allows_at(hour, day, midnight):
+                        tier.append(self.entries[i])
+                elif MediaProcessor._test_candidate_hints(self.entries[i].hints, when):
+                    tier.append(self.entries[i])
+            random.shuffle(tier)
+            found += tier
+            if len(found) >= limit:
+                return found[:limit]
+        return found
+
+    def increment(self, entry, by=1):
+        """Bumps the play count of entry and moves it to its new bucket"""
+        i = self.positions[id(entry)]
+        key = (entry.duration, i)
+        bucket = self.buckets[entry.count]
+        del bucket[bisect_left(bucket, key)]
+        if not len(bucket):
+            del self.buckets[entry.count]
+            self.counts.remove(entry.count)
+
+        entry.count += by
+        if entry.count not in self.buckets:
+            self.buckets[entry.count] = []
+            insort(self.counts, entry.count)
+        insort(self.buckets[entry.count], key)
@@ -1,22 +1,19 @@
 import logging
-import sys
+import os
 import random
 from fs42.catalog_entry import CatalogEntry, MatchingContentNotFound, NoFillerContentFound
 from fs42.catalog_api import CatalogAPI
 from fs42.timings import MIN_5, DAYS
 from fs42.liquid_blocks import ReelBlock
 from fs42.media_processor import MediaProcessor
+from fs42.candidate_index import CandidateIndex
+from fs42.columnar_index import ColumnarIndex
+from fs42.play_count_buffer import PlayCountBuffer
+from fs42.reel_solver import ReelSolver
+from fs42.sql_catalog import SqlCatalog, SqlCandidateIndex, SqlTagView
 from fs42.sequence_api import SequenceAPI
 
 
-try:
-    # try to import from version > 2.0
-    from moviepy import VideoFileClip
-except ImportError:
-    # fall back to import from version 1.0
-    from moviepy.editor import VideoFileClip  # type: ignore
-
-
 FF_USE_FLUID_FILE_CACHE = True
 FF_USE_CATAGLOG_DB = True
 
@@ -37,19 +34,30 @@ class ShowCatalog:
     prebump = "prebump"
     postbump = "postbump"
 
-    def __init__(self, config, rebuild_catalog=False, load=True, debug=False, force=False):
+    def __init__(
+        self, config, rebuild_catalog=False, load=True, debug=False, force=False, incremental=False, shared_scan=None
+    ):
         self.config = config
         self._l = logging.getLogger(f"{self.config['network_name']} - CAT")
 
         # the main index for videos
         self.clip_index = {}
-        # the tag/duration cache index
+        # the tag/duration cache index - a CandidateIndex per tag, built when a tag is first searched
         self.tag_dur_cache = {}
 
         # basically, a flattened list of clip_index keys
         self.tags = []
 
+        # every pick is counted here and written back in batches
+        self.play_counts = PlayCountBuffer(config)
+        # set when the "sql" catalog backend answers lookups instead of the in-memory clip_index
+        self.backend = None
+
         self.__fluid_builder = None
+        # incremental rebuilds diff against the stored catalog instead of replacing it
+        self.__incremental = incremental
+        # multi-station builds share walks and probes for folders used by more than one station
+        self.__shared = shared_scan
         self.min_gap = 3
         if rebuild_catalog:
             if force:
@@ -74,12 +82,29 @@ class ShowCatalog:
             except Exception as e:
                 print(f"Error processing tag '{tag}': {e}")
 
+        if self.__incremental:
+            delta = CatalogAPI.sync_entries(self.config, flat_list)
+            self._l.info(
+                f"Incremental catalog update: {delta['added']} added, {delta['updated']} updated, "
+                f"{delta['removed']} removed, {delta['unchanged']} unchanged"
+            )
+            return delta
+
         CatalogAPI.set_entries(self.config, flat_list)
+        return {"added": len(flat_list), "updated": 0, "removed": 0, "unchanged": 0}
 
     def load_catalog(self):
         if self.config["network_type"] == "streaming":
             return
 
+        if self.config.get("catalog_backend", "memory") == "sql":
+            # only the tag sizes are loaded, entries are queried as they are needed
+            self.backend = SqlCatalog(self.config)
+            self.clip_index = {
+                tag: SqlTagView(self.backend, tag, size) for tag, size in self.backend.tag_sizes().items()
+            }
+            return
+
         catalog_entries = CatalogAPI.get_entries(self.config)
         
         self.clip_index = {}
@@ -100,7 +125,10 @@ class ShowCatalog:
 
                     self.__fluid_builder = FluidBuilder()
                     self._l.info("Initializing fluid file cache...")
-                    self.__fluid_builder.scan_file_cache(self.config["content_dir"])
+                    if self.__shared:
+                        self.__shared.scan_file_cache(self.__fluid_builder, self.config["content_dir"])
+                    else:
+                        self.__fluid_builder.scan_file_cache(self.config["content_dir"])
                     self._l.info("Fluid file cache updated - continuing build")
 
                 return self._build_standard()
@@ -117,26 +145,45 @@ class ShowCatalog:
         self.tags = []
         # for station types with all files in a single directory
         self._l.info(f"Checking for media in {self.config['content_dir']} for single directory")
-        file_list = MediaProcessor._find_media(self.config["content_dir"])
-        self.clip_index[tag] = MediaProcessor._process_media(file_list, tag)
+        file_list = self._find_media(self.config["content_dir"])
+        self.clip_index[tag] = self._process_media(file_list, tag)
         self._l.info(f"Building complete - processed {len(file_list)} files")
-        self._write_catalog()
+        return self._write_catalog()
+
+    def _find_media(self, path):
+        if self.__shared:
+            return self.__shared.find_media(path)
+        return MediaProcessor._find_media(path)
+
+    def _process_media(self, file_list, tag):
+        if self.__shared:
+            return self.__shared.process_media(file_list, tag, fluid=self.__fluid_builder)
+        return MediaProcessor._process_media(file_list, tag, fluid=self.__fluid_builder)
+
+    def _process_subs(self, dir_path, tag, is_bumps):
+        if self.__shared:
+            return self.__shared.process_subs(dir_path, tag, bumpdir=is_bumps, fluid=self.__fluid_builder)
+        return MediaProcessor._process_subs(dir_path, tag, bumpdir=is_bumps, fluid=self.__fluid_builder)
+
+    def _process_station_video(self, path, tag):
+        # these usually live outside content_dir, so bring them into the file cache before probing
+        if self.__fluid_builder:
+            self.__fluid_builder.update_files([path])
+        entries = self._process_media([path], tag)
+        if not len(entries):
+            self._l.error(f"Could not get a duration for the {tag} video {path}")
+        return entries
 
     def _build_tags(self):
         self.tags = list(self.clip_index.keys())
 
-    def _build_standard(self):
-        self.clip_index = {}
-        self.tags = []
-
-        self._l.info("Standard network")
-        start_bumps = {}
-        end_bumps = {}
-
-        # get the list of all tags
+    def _slot_tags(self):
+        # walk the slots and collect every tag and directory override they reference
         tags = {}
         bump_overrides = {}
         commercial_overrides = {}
+        start_bumps = {}
+        end_bumps = {}
         for day in DAYS:
             slots = self.config[day]
             for k in slots:
@@ -155,6 +202,38 @@ class ShowCatalog:
                         start_bumps[slots[k]["start_bump"]] = True
                     if "end_bump" in slots[k]:
                         end_bumps[slots[k]["end_bump"]] = True
+        return (tags, bump_overrides, commercial_overrides, start_bumps, end_bumps)
+
+    def _scan_targets(self):
+        # the (tag, is_bumps) directories a build scans, in build order and without repeats
+        if self.config["network_type"] != "standard":
+            return []
+        (tags, bump_overrides, commercial_overrides, _sb, _eb) = self._slot_tags()
+        targets = [(tag, False) for tag in tags]
+        if "commercial_dir" in self.config:
+            targets.append((self.config["commercial_dir"], False))
+        if "bump_dir" in self.config and self.config["bump_dir"]:
+            targets.append((self.config["bump_dir"], True))
+        targets += [(override_dir, True) for override_dir in bump_overrides]
+        targets += [(override_dir, False) for override_dir in commercial_overrides]
+
+        unique = []
+        seen = set()
+        for tag, is_bumps in targets:
+            # like _scan_directory, the first scan of a tag wins
+            if tag not in seen:
+                seen.add(tag)
+                unique.append((tag, is_bumps))
+        return unique
+
+    def _build_standard(self):
+        self.clip_index = {}
+        self.tags = []
+
+        self._l.info("Standard network")
+
+        # get the list of all tags
+        (tags, bump_overrides, commercial_overrides, start_bumps, end_bumps) = self._slot_tags()
 
         SequenceAPI.scan_sequences(self.config)
 
@@ -164,7 +243,7 @@ class ShowCatalog:
         # collect start and end bumps first
         for fp in start_bumps:
             path = f"{self.config['content_dir']}/{fp}"
-            sb = MediaProcessor._process_media([path], "start_bumps", fluid=self.__fluid_builder)
+            sb = self._process_media([path], "start_bumps")
             if len(sb) == 1:
                 self.clip_index["start_bumps"].append(sb[0])
             else:
@@ -173,7 +252,7 @@ class ShowCatalog:
 
         for fp in end_bumps:
             path = f"{self.config['content_dir']}/{fp}"
-            eb = MediaProcessor._process_media([path], "end_bumps", fluid=self.__fluid_builder)
+            eb = self._process_media([path], "end_bumps")
             if len(eb) == 1:
                 self.clip_index["end_bumps"].append(eb[0])
             else:
@@ -203,17 +282,15 @@ class ShowCatalog:
         # add sign-off and off-air videos to the clip index
         if "sign_off_video" in self.config:
             self._l.debug("Adding sign-off video")
-            video_clip = VideoFileClip(self.config["sign_off_video"])
-            self.clip_index["sign_off"] = [CatalogEntry(self.config["sign_off_video"], video_clip.duration, "sign_off")]
+            self.clip_index["sign_off"] = self._process_station_video(self.config["sign_off_video"], "sign_off")
             self._l.debug(f"Added sign-off video {self.config['sign_off_video']}")
-            total_count += 1
+            total_count += len(self.clip_index["sign_off"])
 
         if "off_air_video" in self.config:
             self._l.debug("Adding off air video")
-            video_clip = VideoFileClip(self.config["off_air_video"])
-            self.clip_index["off_air"] = [CatalogEntry(self.config["off_air_video"], video_clip.duration, "off_air")]
+            self.clip_index["off_air"] = self._process_station_video(self.config["off_air_video"], "off_air")
             self._l.debug(f"Added off air video {self.config['off_air_video']}")
-            total_count += 1
+            total_count += len(self.clip_index["off_air"])
 
         if "off_air_image" in self.config:
             self._l.debug("Adding offair image")
@@ -223,7 +300,7 @@ class ShowCatalog:
 
         self._l.info(f"Catalog build complete. Added {total_count} clips to catalog.")
         self._build_tags()
-        self._write_catalog()
+        return self._write_catalog()
 
     def _scan_directory(self, tag, is_bumps=False):
         count_added = 0
@@ -231,13 +308,13 @@ class ShowCatalog:
             self.clip_index[tag] = []
             self._l.info(f"Checking for media with tag={tag} in content folder")
             tag_dir = f"{self.config['content_dir']}/{tag}"
-            file_list = MediaProcessor._find_media(tag_dir)
+            file_list = self._find_media(tag_dir)
 
-            self.clip_index[tag] = MediaProcessor._process_media(file_list, tag, fluid=self.__fluid_builder)
+            self.clip_index[tag] = self._process_media(file_list, tag)
             self._l.info(f"--Found {len(self.clip_index[tag])} videos in {tag} folder")
             self._l.debug(f"---- {tag} media listing: {self.clip_index[tag]}")
 
-            subdir_clips = MediaProcessor._process_subs(tag_dir, tag, bumpdir=is_bumps, fluid=self.__fluid_builder)
+            subdir_clips = self._process_subs(tag_dir, tag, is_bumps)
 
             self._l.info(f"--Found {len(subdir_clips)} videos in {tag} subfolders")
             self._l.debug(f"---- {tag} sub folder media listing: {subdir_clips}")
@@ -255,6 +332,60 @@ class ShowCatalog:
                 count_added += len(self.clip_index[tag])
         return count_added
 
+    def apply_file_changes(self, changed_paths, removed_paths) -> dict:
+        """
+        Applies a set of created/modified and removed files to the stored catalog without a rescan.
+        Paths are expected in the same form a build produces: content_dir + "/" + relative path.
+        """
+        content_dir = self.config["content_dir"]
+        jobs_by_tag = {}
+
+        if self.config["network_type"] == "loop":
+            # loop channels only use the files directly inside the content dir
+            targets = [(content_dir, "content", False, False)]
+        else:
+            targets = [(f"{content_dir}/{tag}", tag, is_bumps, True) for (tag, is_bumps) in self._scan_targets()]
+
+        extensions = MediaProcessor._extension_set()
+        for fpath in changed_paths:
+            if os.path.splitext(fpath)[1][1:].lower() not in extensions:
+                continue
+            for tag_dir, tag, is_bumps, with_subs in targets:
+                rel = os.path.relpath(fpath, tag_dir)
+                if rel.startswith(".."):
+                    continue
+                parts = rel.split(os.sep)
+                if len(parts) == 1:
+                    hints = []
+                elif with_subs:
+                    hints = MediaProcessor._process_hints(f"{tag_dir}/{parts[0]}", tag, is_bumps)
+                else:
+                    continue
+                # spell the path the way the media walker does during a build
+                catalog_path = f"{tag_dir}/{'/'.join(parts)}"
+                jobs_by_tag.setdefault((tag, is_bumps), []).append((catalog_path, hints, len(parts) > 1))
+
+        if len(jobs_by_tag) and FF_USE_FLUID_FILE_CACHE and self.config["network_type"] == "standard":
+            from fs42.fluid_builder import FluidBuilder
+
+            self.__fluid_builder = FluidBuilder()
+
+        to_upsert = []
+        for (tag, is_bumps), jobs in jobs_by_tag.items():
+            top = [(fpath, hints) for (fpath, hints, in_sub) in jobs if not (is_bumps and in_sub)]
+            subs = [(fpath, hints) for (fpath, hints, in_sub) in jobs if is_bumps and in_sub]
+            to_upsert += MediaProcessor._process_jobs(top, tag, fluid=self.__fluid_builder)
+            if len(subs):
+                # bumps in sub folders are sorted by position just like in a full build
+                clips = MediaProcessor._process_jobs(subs, tag, fluid=self.__fluid_builder)
+                (pre, fill, post) = MediaProcessor._by_position(clips, ShowCatalog.prebump, ShowCatalog.postbump)
+                to_upsert += pre + fill + post
+
+        upserted = CatalogAPI.upsert_entries(self.config, to_upsert) if len(to_upsert) else 0
+        removed = CatalogAPI.delete_paths(self.config, removed_paths) if len(removed_paths) else 0
+        self._l.info(f"Applied file changes to catalog: {upserted} added or updated, {removed} removed")
+        return {"upserted": upserted, "removed": removed}
+
     def get_text_listing(self):
         content = "TITLE                | TAG        | Duration  | Hints\n"
         for tag in self.clip_index:
@@ -280,6 +411,8 @@ class ShowCatalog:
 
     def get_signoff(self):
         if "sign_off" in self.clip_index:
+            if isinstance(self.clip_index["sign_off"], SqlTagView):
+                return list(self.clip_index["sign_off"])
             return self.clip_index["sign_off"]
         return None
 
@@ -301,50 +434,55 @@ class ShowCatalog:
         return None
 
     def entry_by_fpath(self, fpath):
+        if self.backend:
+            return self.backend.by_path(fpath)
         results = CatalogAPI.get_by_path(self.config, fpath)
         return results
 
-    def _lowest_count(self, candidates):
-        min_count = sys.maxsize
-        lowest_matches = []
-        for candidate in candidates:
-            if candidate.count < min_count:
-                min_count = candidate.count
-                lowest_matches = [candidate]
-            elif candidate.count == min_count:
-                lowest_matches.append(candidate)
-
-        return random.choice(lowest_matches)
-
     def get_all_by_tag(self, tag):
         if tag in self.clip_index and len(self.clip_index[tag]):
+            if isinstance(self.clip_index[tag], SqlTagView):
+                return list(self.clip_index[tag])
             return self.clip_index[tag]
         else:
             return None
 
+    def _tag_index(self, tag) -> CandidateIndex:
+        index = self.tag_dur_cache.get(tag, None)
+        if index is None or not index.is_current(self.clip_index[tag]):
+            # big tags get NumPy columns when it is installed
+            if isinstance(self.clip_index[tag], SqlTagView):
+                index = SqlCandidateIndex(self.clip_index[tag])
+            elif ColumnarIndex.usable(self.clip_index[tag]):
+                index = ColumnarIndex(self.clip_index[tag])
+            else:
+                index = CandidateIndex(self.clip_index[tag])
+            self.tag_dur_cache[tag] = index
+        return index
+
     def find_candidate(self, tag, seconds, when):
 
         if tag in self.clip_index and len(self.clip_index[tag]):
-            candidates = self.clip_index[tag]
-            matches = []
-            for candidate in candidates:
-                # restrict content to fit and be valid (zero duration is likely not valid)
-                if (
-                    candidate.duration < seconds
-                    and candidate.duration >= 1
-                    and MediaProcessor._test_candidate_hints(candidate.hints, when)
-                ):
-                    matches.append(candidate)
-            #random.shuffle(matches)
-            if not len(matches):
+            # restrict content to fit and be valid (zero duration is likely not valid)
+            result = self._tag_index(tag).pick_lowest(seconds, when)
+            if result is None:
                 err = f"Could not find candidate video for tag={tag} under {seconds} in len - maybe add some shorter content?"
                 raise (MatchingContentNotFound(err))
-            result = self._lowest_count(matches)
-            # note, this has been migrated
-            result.count += 1
-            # CatalogAPI.set_play_count(self.config, result.path, result.count)
+            self._record_pick(tag, result)
             return result
 
+    def _record_pick(self, tag, entry):
+        # the index moves it to its new play count bucket and the buffer saves it later
+        self._tag_index(tag).increment(entry)
+        if not self.backend:
+            self.play_counts.record(entry)
+
+    def save_play_counts(self):
+        """Writes every play counted so far to the catalog"""
+        if self.backend:
+            self.backend.commit()
+        self.play_counts.flush()
+
 
     def find_filler(self, seconds, when):
         bump_tag = self.config["bump_dir"]
@@ -407,6 +545,9 @@ class ShowCatalog:
         return ReelBlock(start_candidate, reels, end_candidate)
 
     def make_reel_fill(self, when, length, use_bumpers=True, commercial_dir=None, bump_dir=None, strict_count=None):
+        if self.config.get("reel_fill", "greedy") == "solver":
+            return ReelSolver(self).fill(when, length, use_bumpers, commercial_dir, bump_dir, strict_count)
+
         target_break_duration = self.config["break_duration"]
 
         if strict_count:
@@ -496,8 +637,12 @@ class ShowCatalog:
 
     def summary_data(self):
         count = 0
+        # the sql backend counts rows instead of loading them
+        sizes = self.backend.tag_sizes() if self.backend else {}
         for tag in self.tags:
-            if type(self.clip_index[tag]) is list:
+            if tag in sizes:
+                count += sizes[tag]
+            elif type(self.clip_index[tag]) is list:
                 count += len(self.clip_index[tag])
             else:
                 count += 1
@@ -21,6 +21,18 @@ class CatalogAPI:
         CatalogAPI.delete_catalog(station_config)
         CatalogIO().put_catalog_entries(station_config["network_name"], entries)
 
+    @staticmethod
+    def sync_entries(station_config, entries: list[CatalogEntry]) -> dict:
+        return CatalogIO().sync_catalog_entries(station_config["network_name"], entries)
+
+    @staticmethod
+    def upsert_entries(station_config, entries: list[CatalogEntry]) -> int:
+        return CatalogIO().upsert_catalog_entries(station_config["network_name"], entries)
+
+    @staticmethod
+    def delete_paths(station_config, paths: list[str]) -> int:
+        return CatalogIO().delete_catalog_paths(station_config["network_name"], paths)
+
     @staticmethod
     def search_entries(station_config, query: str):
         return CatalogIO().search_catalog_entries(station_config["network_name"], query)
@@ -48,9 +60,17 @@ class CatalogAPI:
                 flat.append(entry)
         CatalogIO().batch_increment_counts(station_config["network_name"], flat)
 
+    @staticmethod
+    def add_play_counts(station_config, counts: dict) -> int:
+        return CatalogIO().add_play_counts(station_config["network_name"], counts)
+
     @staticmethod
     def get_entry_by_id(entry_id):
         return CatalogIO().entry_by_id(entry_id)
+
+    @staticmethod
+    def get_entries_by_ids(entry_ids) -> dict:
+        return CatalogIO().entries_by_ids(entry_ids)
     
     @staticmethod
     def find_best_candidates(station_config, tag: str, max_duration: float):
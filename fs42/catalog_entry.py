@@ -17,6 +17,8 @@ class CatalogEntry:
     def __init__(self, path, duration, tag, hints=[], count=0):
         self.path = path
         self.realpath = None
+        # probe summary, only set when the file was just probed
+        self.meta = None
         # get the show name from the path
         self.title = os.path.splitext(os.path.basename(path))[0]
         self.duration = duration
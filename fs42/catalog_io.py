@@ -1,78 +1,21 @@
-import sqlite3
 import json
-import os
 import logging
 
+from fs42.db_pool import DBPool
+from fs42.migrations import Migrations
 from fs42.station_manager import StationManager
 from fs42.catalog_entry import CatalogEntry
+from fs42.search_query import SearchQuery
 
 
 class CatalogIO:
     def __init__(self):
         self.db_path = StationManager().server_conf["db_path"]
         self._l = logging.getLogger("CATIO")
-        self._init_catalog_table()
-
-    def _init_catalog_table(self):
-        """
-        Creates a database table to hold CatalogEntry records.
-        Each record is associated with a station (text string).
-        """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-
-            # Create the table with new schema
-            cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_entries (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                station TEXT NOT NULL,
-                                path TEXT NOT NULL,
-                                title TEXT NOT NULL,
-                                duration REAL NOT NULL,
-                                tag TEXT NOT NULL,
-                                count INTEGER DEFAULT 0,
-                                hints TEXT,
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                realpath TEXT,
-                                UNIQUE(station, tag, path)
-                                )
-                            """)
-
-            # Check if realpath column exists, add it if it doesn't
-            cursor.execute("PRAGMA table_info(catalog_entries)")
-            columns = [column[1] for column in cursor.fetchall()]
-
-            if "realpath" not in columns:
-                self._l.info("Adding realpath column to catalog_entries table")
-                cursor.execute("ALTER TABLE catalog_entries ADD COLUMN realpath TEXT")
-
-                # Populate realpath for existing entries
-                cursor.execute("SELECT id, path FROM catalog_entries WHERE realpath IS NULL")
-                rows = cursor.fetchall()
-                for row_id, path in rows:
-                    try:
-                        realpath = os.path.realpath(path)
-                        cursor.execute("UPDATE catalog_entries SET realpath = ? WHERE id = ?", (realpath, row_id))
-                    except Exception as e:
-                        self._l.warning(f"Could not compute realpath for {path}: {e}")
-
-                connection.commit()
-                self._l.info(f"Updated realpath for {len(rows)} existing entries")
-
-            # Create indexes
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_station 
-                            ON catalog_entries(station)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag 
-                            ON catalog_entries(tag)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_path
-                    ON catalog_entries(path)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag_duration_count
-                    ON catalog_entries(station, tag, duration, count)""")
-
-            cursor.close()
+        self.has_fts = "catalog_entries_fts" in Migrations.ensure(self.db_path)
 
     def entry_by_id(self, entry_id: int):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -87,45 +30,189 @@ class CatalogIO:
 
             return None
 
-    def put_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]):
-        with sqlite3.connect(self.db_path) as connection:
+    # ids per IN (...) query - under the 999 parameter limit of older SQLite builds
+    ids_per_query = 900
+
+    def entries_by_ids(self, entry_ids) -> dict:
+        """Fetches the entries for entry_ids with one IN query per chunk, returns {id: CatalogEntry}"""
+        entry_ids = list(entry_ids)
+        entries = {}
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
+            for start in range(0, len(entry_ids), CatalogIO.ids_per_query):
+                chunk = entry_ids[start : start + CatalogIO.ids_per_query]
+                cursor.execute(
+                    f"SELECT * FROM catalog_entries WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    entries[row[0]] = CatalogEntry.from_db_row(row)
+            cursor.close()
+        return entries
+
+    @staticmethod
+    def _hints_json(entry: CatalogEntry, memo: dict = None):
+        """
+        Hints are stored as a JSON list of JSON encoded hints. Entries from the same folder share one
+        hints list, so pass a memo to encode each distinct list once per write.
+        """
+        if not entry.hints:
+            return None
+        if memo is not None and id(entry.hints) in memo:
+            return memo[id(entry.hints)][1]
+        hints_json = json.dumps([json.dumps(hint.toJSON()) for hint in entry.hints])
+        if memo is not None:
+            # keep the list alive so its id can't be reused while the memo is
+            memo[id(entry.hints)] = (entry.hints, hints_json)
+        return hints_json
+
+    def put_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]):
+        memo = {}
 
+        def rows():
             for entry in catalog_entries:
                 if isinstance(entry, CatalogEntry):
-                    # Convert hints list to JSON string for storage
-                    hints = []
-                    for hint in entry.hints:
-                        hint_json = json.dumps(hint.toJSON()) if entry.hints else None
-                        hints.append(hint_json)
-                    hints_json = json.dumps(hints) if hints else None
-
-                    # Use INSERT OR REPLACE to overwrite existing entries
-
-                    cursor.execute(
-                        """INSERT OR REPLACE INTO catalog_entries 
-                                    (station, path, realpath, title, duration, tag, count, hints, updated_at)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
-                        (
-                            station_name,
-                            entry.path,
-                            entry.realpath,
-                            entry.title,
-                            entry.duration,
-                            entry.tag,
-                            entry.count,
-                            hints_json,
-                        ),
+                    yield (
+                        station_name,
+                        entry.path,
+                        entry.realpath,
+                        entry.title,
+                        entry.duration,
+                        entry.tag,
+                        entry.count,
+                        CatalogIO._hints_json(entry, memo),
                     )
-
                 else:
                     print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
 
+        with DBPool.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            # Use INSERT OR REPLACE to overwrite existing entries
+            DBPool.write_chunks(
+                cursor,
+                """INSERT OR REPLACE INTO catalog_entries 
+                   (station, path, realpath, title, duration, tag, count, hints, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                rows(),
+            )
             connection.commit()
             cursor.close()
+        DBPool.checkpoint(self.db_path)
+
+    def sync_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]) -> dict:
+        """
+        Brings the stored catalog in line with catalog_entries by (station, tag, path) in one transaction.
+        New rows are inserted, changed rows are updated in place and vanished rows are deleted, so ids
+        and play counts of everything that is still on disk stay stable.
+        """
+        with DBPool.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT id, tag, path, title, duration, hints, realpath
+                   FROM catalog_entries WHERE station = ?""",
+                (station_name,),
+            )
+            existing = {(row[1], row[2]): row for row in cursor.fetchall()}
+
+            inserts = []
+            updates = []
+            seen = set()
+            for entry in catalog_entries:
+                if not isinstance(entry, CatalogEntry):
+                    print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
+                    continue
+
+                key = (entry.tag, entry.path)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                hints_json = CatalogIO._hints_json(entry)
+                row = existing.get(key, None)
+                if row is None:
+                    inserts.append(
+                        (station_name, entry.path, entry.realpath, entry.title, entry.duration, entry.tag, hints_json)
+                    )
+                elif (row[3], row[4], row[5], row[6]) != (entry.title, entry.duration, hints_json, entry.realpath):
+                    updates.append((entry.title, entry.duration, hints_json, entry.realpath, row[0]))
+
+            deletes = [(row[0],) for key, row in existing.items() if key not in seen]
+
+            cursor.executemany(
+                """INSERT INTO catalog_entries (station, path, realpath, title, duration, tag, hints, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                inserts,
+            )
+            cursor.executemany(
+                """UPDATE catalog_entries
+                   SET title = ?, duration = ?, hints = ?, realpath = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                updates,
+            )
+            cursor.executemany("DELETE FROM catalog_entries WHERE id = ?", deletes)
+            connection.commit()
+            cursor.close()
+        DBPool.checkpoint(self.db_path)
+
+        return {
+            "added": len(inserts),
+            "updated": len(updates),
+            "removed": len(deletes),
+            "unchanged": len(seen) - len(inserts) - len(updates),
+        }
+
+    def upsert_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]) -> int:
+        """Inserts or updates entries by (station, tag, path) - ids and play counts of existing rows are kept."""
+        rows = []
+        for entry in catalog_entries:
+            rows.append(
+                (
+                    station_name,
+                    entry.path,
+                    entry.realpath,
+                    entry.title,
+                    entry.duration,
+                    entry.tag,
+                    CatalogIO._hints_json(entry),
+                )
+            )
+
+        with DBPool.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                """INSERT INTO catalog_entries (station, path, realpath, title, duration, tag, hints, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT(station, tag, path) DO UPDATE SET
+                        realpath = excluded.realpath,
+                        title = excluded.title,
+                        duration = excluded.duration,
+                        hints = excluded.hints,
+                        updated_at = CURRENT_TIMESTAMP""",
+                rows,
+            )
+            connection.commit()
+            cursor.close()
+        return len(rows)
+
+    def delete_catalog_paths(self, station_name: str, paths: list[str]) -> int:
+        """Deletes entries for each path, or for everything below it when the path was a directory."""
+        removed = 0
+        with DBPool.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            for path in paths:
+                prefix = path.rstrip("/") + "/"
+                cursor.execute(
+                    """DELETE FROM catalog_entries
+                       WHERE station = ? AND (path = ? OR (path >= ? AND path < ?))""",
+                    (station_name, path, prefix, prefix[:-1] + chr(ord("/") + 1)),
+                )
+                removed += cursor.rowcount
+            connection.commit()
+            cursor.close()
+        return removed
 
     def get_catalog_entries(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
 
             cursor.execute(
@@ -148,7 +235,31 @@ class CatalogIO:
             return catalog_entries
 
     def search_catalog_entries(self, station_name: str, query: str):
-        with sqlite3.connect(self.db_path) as connection:
+        """Entries whose title, tag or path has words starting with each word of query - best matches first"""
+        match = SearchQuery.to_match(query)
+        if not match:
+            # nothing but punctuation - neither MATCH nor LIKE would narrow anything down
+            return []
+
+        if not self.has_fts:
+            return self._like_search_catalog_entries(station_name, query)
+
+        with DBPool.connect(self.db_path, readonly=True) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT catalog_entries.* FROM catalog_entries_fts
+                   JOIN catalog_entries ON catalog_entries.id = catalog_entries_fts.rowid
+                   WHERE catalog_entries_fts MATCH ? AND catalog_entries.station = ?
+                   ORDER BY catalog_entries_fts.rank, catalog_entries.tag, catalog_entries.title""",
+                (match, station_name),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return [CatalogEntry.from_db_row(row) for row in rows]
+
+    def _like_search_catalog_entries(self, station_name: str, query: str):
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -166,14 +277,14 @@ class CatalogIO:
             return catalog_entries
 
     def delete_all_entries_for_station(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute("""DELETE FROM catalog_entries WHERE station = ?""", (station_name,))
             connection.commit()
             cursor.close()
 
     def get_entry_by_path(self, station_name: str, path: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -190,7 +301,7 @@ class CatalogIO:
             return None
 
     def get_by_tag(self, station_name: str, tag: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -207,7 +318,7 @@ class CatalogIO:
             return catalog_entries
 
     def update_entry_count(self, station_name: str, path: str, new_count: int):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """UPDATE catalog_entries 
@@ -220,23 +331,35 @@ class CatalogIO:
 
     # make a function to batch increment counts for multiple entries
     def batch_increment_counts(self, station_name: str, entries: list[CatalogEntry]):
-        with sqlite3.connect(self.db_path) as connection:
+        # one update per path, however many times it was played
+        counts = {}
+        for entry in entries:
+            if isinstance(entry, CatalogEntry):
+                counts[entry.path] = counts.get(entry.path, 0) + 1
+            else:
+                print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
+        self.add_play_counts(station_name, counts)
+
+    def add_play_counts(self, station_name: str, counts: dict) -> int:
+        """Applies {path: plays} as count = count + plays in a single transaction"""
+        with DBPool.connect(self.db_path) as connection:
             cursor = connection.cursor()
-            for entry in entries:
-                if isinstance(entry, CatalogEntry):
-                    cursor.execute(
-                        """UPDATE catalog_entries 
-                                      SET count = count + 1, updated_at = CURRENT_TIMESTAMP 
-                                      WHERE station = ? AND path = ?""",
-                        (station_name, entry.path),
-                    )
-                else:
-                    print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
+            # total_changes counts for the life of the pooled connection
+            before = connection.total_changes
+            DBPool.write_chunks(
+                cursor,
+                """UPDATE catalog_entries
+                              SET count = count + ?, updated_at = CURRENT_TIMESTAMP
+                              WHERE station = ? AND path = ?""",
+                ((plays, station_name, path) for path, plays in counts.items()),
+            )
+            updated = connection.total_changes - before
             connection.commit()
             cursor.close()
+        return updated
 
     def find_best_candidates(self, station_name: str, tag: str, max_duration: float):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -0,0 +1,280 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from fs42.media_processor import MediaProcessor
+
+
+class InotifyWatcher:
+    """Recursive inotify watch over a set of root directories (Linux only)"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    watch_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    _event_header = struct.Struct("iIII")
+
+    def __init__(self, roots):
+        self._l = logging.getLogger("WATCH")
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # only media files are worth probing - subtitles, nfo files and partial downloads are ignored
+        self._extensions = MediaProcessor._extension_set()
+        self._paths = {}
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), self.watch_mask)
+        if wd < 0:
+            self._l.warning(f"Could not watch {dir_path} - errno {ctypes.get_errno()}")
+            return
+        self._paths[wd] = dir_path
+
+    def _remove_tree(self, root):
+        # drop the watches on root and everything below it - their paths are stale once the folder moves
+        prefix = root + "/"
+        for wd, dir_path in list(self._paths.items()):
+            if dir_path == root or dir_path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+    def _add_tree(self, root):
+        # watch root and every (non hidden) folder below it
+        to_visit = [root]
+        while to_visit:
+            dir_path = to_visit.pop()
+            self._add_watch(dir_path)
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                            to_visit.append(f"{dir_path}/{entry.name}")
+            except OSError as e:
+                self._l.debug(f"Could not scan {dir_path}: {e}")
+
+    def poll(self, timeout):
+        """Waits up to timeout seconds and returns a list of ("changed"|"removed"|"rescan", path) events"""
+        ready, _w, _x = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            (wd, mask, _cookie, length) = self._event_header.unpack_from(buffer, offset)
+            offset += self._event_header.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(("rescan", None))
+                continue
+
+            dir_path = self._paths.get(wd, None)
+            if dir_path is None:
+                continue
+
+            if mask & self.IN_IGNORED:
+                del self._paths[wd]
+                continue
+
+            if not name or name.startswith("."):
+                continue
+
+            path = f"{dir_path}/{name}"
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # a new folder - watch it and pick up anything already copied into it
+                    self._add_tree(path)
+                    for fpath, _rp, _sz, _mt in MediaProcessor.walk_media(path, True, False):
+                        events.append(("changed", fpath))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    # a folder moved within the tree gets fresh watches from its IN_MOVED_TO
+                    self._remove_tree(path)
+                    events.append(("removed", path))
+            elif os.path.splitext(name)[1][1:].lower() not in self._extensions:
+                continue
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                events.append(("changed", path))
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                events.append(("removed", path))
+
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Portable fallback - compares (size, mtime) snapshots from the media walker every interval"""
+
+    def __init__(self, roots, interval=30.0):
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_check = time.monotonic() + self.interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for root in self.roots:
+            for fpath, _rp, size, mtime in MediaProcessor.walk_media(root):
+                snapshot[fpath] = (size, mtime)
+        return snapshot
+
+    def poll(self, timeout):
+        wait = self._next_check - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self._next_check = time.monotonic() + self.interval
+
+        current = self._take_snapshot()
+        events = [("changed", fp) for fp, stats in current.items() if self._snapshot.get(fp, None) != stats]
+        events += [("removed", fp) for fp in self._snapshot if fp not in current]
+        self._snapshot = current
+        return events
+
+    def close(self):
+        pass
+
+
+class CatalogWatcher:
+    """
+    Keeps catalogs live by watching each station's content_dir. Events are debounced, then only the
+    created/modified files are probed and written to file_meta and catalog_entries. on_reload is
+    called after every applied batch so players can pick up the change (reload_data).
+    """
+
+    def __init__(self, stations, on_reload=None, debounce=5.0, poll_interval=30.0, use_inotify=True):
+        self._l = logging.getLogger("WATCH")
+        self.on_reload = on_reload
+        self.debounce = debounce
+        self.stations = [s for s in stations if s["_has_catalog"] and s["network_type"] in ("standard", "loop")]
+
+        # stations can share a content dir, so watch each one once
+        self.roots = {}
+        for station in self.stations:
+            root = station["content_dir"].rstrip("/")
+            self.roots.setdefault(root, []).append(station)
+
+        self._watcher = None
+        if use_inotify:
+            try:
+                self._watcher = InotifyWatcher(list(self.roots.keys()))
+                self._l.info(f"Watching {len(self.roots)} content folders with inotify")
+            except (OSError, AttributeError) as e:
+                self._l.info(f"inotify is not available ({e}) - falling back to polling")
+        if self._watcher is None:
+            self._watcher = PollingWatcher(list(self.roots.keys()), poll_interval)
+            self._l.info(f"Polling {len(self.roots)} content folders every {poll_interval} seconds")
+
+        self._stop = threading.Event()
+
+    def run(self):
+        changed = set()
+        removed = set()
+        rescan = False
+        last_event = None
+
+        while not self._stop.is_set():
+            events = self._watcher.poll(min(1.0, self.debounce))
+            for kind, path in events:
+                if kind == "changed":
+                    changed.add(path)
+                    removed.discard(path)
+                elif kind == "removed":
+                    removed.add(path)
+                    changed.discard(path)
+                else:
+                    rescan = True
+            if len(events):
+                last_event = time.monotonic()
+
+            # wait for things to go quiet before touching the catalogs
+            if last_event is not None and time.monotonic() - last_event >= self.debounce:
+                try:
+                    if rescan:
+                        self._rescan()
+                    else:
+                        self._apply(changed, removed)
+                except Exception as e:
+                    self._l.error("Error applying file changes to catalogs")
+                    self._l.exception(e)
+                changed = set()
+                removed = set()
+                rescan = False
+                last_event = None
+
+        self._watcher.close()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def _apply(self, changed, removed):
+        from fs42.catalog import ShowCatalog
+        from fs42.fluid_builder import FluidBuilder
+
+        self._l.info(f"Applying {len(changed)} changed and {len(removed)} removed files")
+        fluid = FluidBuilder()
+        if len(removed):
+            fluid.remove_files(list(removed))
+        if len(changed):
+            fluid.update_files(list(changed))
+
+        for root, stations in self.roots.items():
+            prefix = root + "/"
+            root_changed = [p for p in changed if p.startswith(prefix)]
+            root_removed = [p for p in removed if p.startswith(prefix)]
+            if not len(root_changed) and not len(root_removed):
+                continue
+            for station in stations:
+                ShowCatalog(station, load=False).apply_file_changes(root_changed, root_removed)
+
+        self._signal_reload()
+
+    def _rescan(self):
+        from fs42.catalog import ShowCatalog
+
+        # the kernel dropped events, so fall back to an incremental rebuild
+        self._l.warning("Watch events were lost - running an incremental catalog rebuild")
+        for station in self.stations:
+            ShowCatalog(station, rebuild_catalog=True, incremental=True)
+        self._signal_reload()
+
+    def _signal_reload(self):
+        if self.on_reload:
+            self.on_reload()
@@ -0,0 +1,97 @@
+import random
+
+from fs42.hint_mask import HintMask
+from fs42.media_processor import MediaProcessor
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+
+class ColumnarIndex:
+    """
+    Same lookups as CandidateIndex, but one tag's entries are held as NumPy columns (duration, count
+    and hint mask id) in catalog order, and each query is a handful of vectorized comparisons. Only
+    the distinct hint masks are tested in Python - usually a few per tag - then mapped back to rows
+    through the mask ids. Row ids index straight into the entry list.
+    """
+
+    # tags smaller than this stay on CandidateIndex, the columns only pay off on big tags
+    min_entries = 2000
+
+    @staticmethod
+    def usable(entries) -> bool:
+        return NUMPY_AVAILABLE and len(entries) >= ColumnarIndex.min_entries
+
+    def __init__(self, entries):
+        self.source = entries
+        self.size = len(entries)
+        self.entries = entries
+        # id(entry) -> row id
+        self.positions = {id(entry): i for i, entry in enumerate(entries)}
+        self.durations = np.array([entry.duration for entry in entries], dtype=np.float64)
+        self.counts = np.array([entry.count for entry in entries], dtype=np.int64)
+
+        # rows share compiled masks, so keep each distinct mask once and store its id per row
+        self.masks = []
+        mask_ids = {}
+        rows = []
+        for entry in entries:
+            mask = HintMask.compile(entry.hints)
+            # hints that can't be compiled get a mask id per row and are tested directly
+            key = id(mask) if mask is not None else ("row", len(rows))
+            if key not in mask_ids:
+                mask_ids[key] = len(self.masks)
+                self.masks.append((mask, entry.hints))
+            rows.append(mask_ids[key])
+        self.mask_ids = np.array(rows, dtype=np.int32)
+
+    def is_current(self, entries) -> bool:
+        # the tag list is replaced or appended to while a catalog builds - rebuild when that happens
+        return entries is self.source and len(entries) == self.size
+
+    def _eligible_rows(self, seconds, when):
+        (hour, day, midnight) = (when.hour, HintMask.day_index(when), HintMask.is_midnight(when))
+        allowed = np.array(
+            [
+                mask.allows_at(hour, day, midnight)
+                if mask is not None
+                else MediaProcessor._test_candidate_hints(hints, when)
+                for (mask, hints) in self.masks
+            ],
+            dtype=bool,
+        )
+        # zero (or near zero) durations are likely not valid, so start at one second
+        return (self.durations >= 1) & (self.durations < seconds) & allowed[self.mask_ids]
+
+    def pick_lowest(self, seconds, when):
+        """The least played entry shorter than seconds whose hints allow when - random among ties"""
+        eligible = self._eligible_rows(seconds, when)
+        if not eligible.any():
+            return None
+        lowest = np.flatnonzero(eligible & (self.counts == self.counts[eligible].min()))
+        return random.choice([self.entries[i] for i in lowest])
+
+    def eligible(self, seconds, when, limit):
+        """Up to limit entries shorter than seconds whose hints allow when - least played first, shuffled among ties"""
+        rows = np.flatnonzero(self._eligible_rows(seconds, when))
+        found = []
+        for count in np.unique(self.counts[rows]):
+            tier_rows = rows[self.counts[rows] == count]
+            # (duration, row) order like a CandidateIndex bucket, so the shuffle gives the same picks
+            tier_rows = tier_rows[np.lexsort((tier_rows, self.durations[tier_rows]))]
+            tier = [self.entries[i] for i in tier_rows]
+            random.shuffle(tier)
+            found += tier
+            if len(found) >= limit:
+                return found[:limit]
+        return found
+
+    def increment(self, entry, by=1):
+        """Bumps the play count of entry in the column and on the entry itself"""
+        self.counts[self.positions[id(entry)]] += by
+        entry.count += by
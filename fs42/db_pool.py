@@ -0,0 +1,115 @@
+import logging
+import os
+import sqlite3
+import threading
+from itertools import islice
+
+
+class DBPool:
+    """
+    Long-lived SQLite connections shared by every IO class, one per thread and database path, so API
+    calls reuse a connection and its prepared statement cache instead of opening a new one each time.
+    Schema setup registered through init_once runs a single time per process and database.
+
+    The database runs in WAL mode, so the player, the web server and the OSD keep reading while a build
+    writes a schedule or catalog. Readers can ask for a read-only connection, which never takes a write
+    lock. Writers wait up to busy_timeout for each other instead of failing straight away.
+
+    Use a pooled connection like a fresh one - `with DBPool.connect(path) as connection:` commits on
+    success and rolls back on error, it just doesn't close the connection afterwards.
+    """
+
+    # prepared statements kept per connection
+    cached_statements = 256
+    # seconds a connection waits on another writer before giving up with "database is locked"
+    busy_timeout = 15
+    # parameter rows passed to each executemany call by write_chunks
+    chunk_rows = 5000
+
+    _local = threading.local()
+    _lock = threading.RLock()
+    # (pid, db_path, name) -> whatever the init function returned
+    _initialized = {}
+    _l = logging.getLogger("DBPOOL")
+
+    @staticmethod
+    def _connections() -> dict:
+        local = DBPool._local
+        # a forked worker must not touch the parent's connections
+        if getattr(local, "pid", None) != os.getpid():
+            local.pid = os.getpid()
+            local.connections = {}
+        return local.connections
+
+    @staticmethod
+    def connect(db_path, readonly=False) -> sqlite3.Connection:
+        connections = DBPool._connections()
+        connection = connections.get((db_path, readonly), None)
+        if connection is None:
+            if readonly:
+                connection = sqlite3.connect(
+                    f"file:{db_path}?mode=ro",
+                    uri=True,
+                    timeout=DBPool.busy_timeout,
+                    cached_statements=DBPool.cached_statements,
+                )
+            else:
+                connection = sqlite3.connect(
+                    db_path, timeout=DBPool.busy_timeout, cached_statements=DBPool.cached_statements
+                )
+                # WAL is remembered by the database file, this only switches it the first time
+                connection.execute("PRAGMA journal_mode = WAL")
+                # INSERT OR REPLACE only fires the delete triggers of the search index with this on
+                connection.execute("PRAGMA recursive_triggers = ON")
+            # with WAL only the last commits can be lost on power failure, never the database
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connections[(db_path, readonly)] = connection
+            DBPool._l.debug(f"Opened {db_path} for thread {threading.current_thread().name} (readonly={readonly})")
+        return connection
+
+    @staticmethod
+    def write_chunks(cursor, sql, rows) -> int:
+        """
+        Runs sql with executemany over rows, chunk_rows at a time. rows can be a generator, so the
+        parameter tuples are built as they are written instead of all up front. Returns the rows written.
+        """
+        written = 0
+        rows = iter(rows)
+        while chunk := list(islice(rows, DBPool.chunk_rows)):
+            cursor.executemany(sql, chunk)
+            written += len(chunk)
+        return written
+
+    @staticmethod
+    def checkpoint(db_path):
+        """
+        Copies what it can of the write-ahead log back into the database without waiting on readers.
+        SQLite checkpoints on its own as the log grows, but readers that never pause can starve that,
+        so writers call this after a big write to keep the log from growing without bound.
+        """
+        (busy, log_pages, moved_pages) = (
+            DBPool.connect(db_path).execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        )
+        if log_pages > moved_pages:
+            DBPool._l.debug(f"Checkpoint moved {moved_pages} of {log_pages} log pages - readers hold the rest")
+        return moved_pages
+
+    @staticmethod
+    def init_once(db_path, name, init):
+        """Runs init(connection) the first time name is set up on db_path in this process and keeps its result"""
+        key = (os.getpid(), db_path, name)
+        if key in DBPool._initialized:
+            return DBPool._initialized[key]
+        with DBPool._lock:
+            if key not in DBPool._initialized:
+                with DBPool.connect(db_path) as connection:
+                    DBPool._initialized[key] = init(connection)
+        return DBPool._initialized[key]
+
+    @staticmethod
+    def close(db_path=None):
+        """Closes this thread's connections - to every database, or just to db_path"""
+        connections = DBPool._connections()
+        for key in list(connections.keys()):
+            if db_path is None or key[0] == db_path:
+                connections.pop(key).close()
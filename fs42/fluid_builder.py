@@ -1,77 +1,154 @@
 import logging
-import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import sys
 import os
 
 sys.path.append(os.getcwd())
 
+from fs42.db_pool import DBPool
+from fs42.migrations import Migrations
 from fs42.fluid_statements import FluidStatements
+from fs42.fluid_objects import FileRepoEntry
 from fs42.media_processor import MediaProcessor
 from fs42.station_manager import StationManager
 
 class FluidBuilder:
     def __init__(self, db_path=None):
-        if db_path is None:
-            self.db_path = StationManager().server_conf["db_path"]
+        self.db_path = db_path if db_path else StationManager().server_conf["db_path"]
 
         self._l = logging.getLogger("FLUID")
-        with sqlite3.connect(self.db_path) as connection:
-            FluidStatements.init_db(connection)
+        Migrations.ensure(self.db_path)
 
-    def scan_file_cache(self, content_dir):
-        with sqlite3.connect(self.db_path) as connection:
-            # read all the files in the content dir
+    def scan_file_cache(self, content_dir, walked=None):
+        with DBPool.connect(self.db_path) as connection:
+            # read all the files in the content dir, unless the caller already walked it
             self._l.info(f"Fluid file cache scan - reading {content_dir}")
-            file_list = MediaProcessor.rich_find_media(content_dir)
+            file_list = MediaProcessor.rich_find_media(content_dir, walked)
             self._l.info(f"Comparing cache against {len(file_list)} files")
-            # add any that aren't there yet
-            FluidStatements.iterate_file_entries(connection, file_list)
-            self._l.info("Checking file meta for stale entries.")
+            # add any that aren't there yet, update changed ones and drop the ones that are gone
+            delta = FluidStatements.iterate_file_entries(connection, file_list, os.path.realpath(content_dir))
+            self._l.info(f"Fluid file cache scan complete: {delta}")
+
+    def update_files(self, file_paths):
+        """Brings just these files up to date in the cache - used by the catalog watcher"""
+        entries = []
+        for fp in file_paths:
+            try:
+                stat = os.stat(fp)
+            except OSError:
+                continue
+            entry = FileRepoEntry()
+            entry.path = os.path.realpath(fp)
+            entry.last_mod = stat.st_mtime
+            entry.size = stat.st_size
+            entries.append(entry)
+
+        with DBPool.connect(self.db_path) as connection:
+            return FluidStatements.iterate_file_entries(connection, entries)
+
+    def remove_files(self, file_paths):
+        """Drops files (or everything below a removed directory) from the cache"""
+        with DBPool.connect(self.db_path) as connection:
+            FluidStatements.remove_file_entries(connection, [os.path.realpath(fp) for fp in file_paths])
 
     def check_file_cache(self, full_path):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             results = FluidStatements.check_file_cache(connection, full_path)
 
         return results
 
+    def get_file_meta(self, full_path):
+        """Probe metadata (codecs, resolution, fps, bitrate, keyframe interval) saved when the file was cached"""
+        with DBPool.connect(self.db_path) as connection:
+            return FluidStatements.get_file_meta(connection, full_path)
+
+    def find_duplicates(self):
+        """Lists groups of cached files with the same content fingerprint"""
+        with DBPool.connect(self.db_path) as connection:
+            return FluidStatements.find_duplicates(connection)
+
     def trim_file_cache(self, from_time):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             self._l.info("Trimming fluid file cache")
             FluidStatements.trim_file_entries(connection, from_time)
 
-    def scan_breaks(self, dir_path):
-        with sqlite3.connect(self.db_path) as connection:
-            
-            self._l.info(f"Scanning directory {dir_path} for breaks")
-            if not os.path.isdir(dir_path):
-                raise FileNotFoundError(f"Directory does not exist {dir_path}")
-            dir_path = os.path.realpath(dir_path)
-            file_list = MediaProcessor._rfind_media(dir_path)
+    @staticmethod
+    def break_scan_budget(workers=None, threads=None):
+        """Splits the cores between concurrent ffmpeg processes and the threads each one may use"""
+        cores = os.cpu_count() or 1
+        if not workers:
+            workers = StationManager().server_conf.get("break_workers", None) or max(1, cores // 2)
+        if not threads:
+            threads = StationManager().server_conf.get("break_threads", None) or max(1, cores // workers)
+        return (int(workers), int(threads))
 
+    def scan_breaks(self, dir_path, workers=None, threads=None, progress=None, mode=None):
+        """
+        Detects break points for every cached file in dir_path on a process pool. Each result is
+        committed as soon as it finishes, so an interrupted scan resumes where it stopped.
+        progress is called with (completed, total, path) after each file.
+        mode is one of MediaProcessor.black_detect_modes (defaults to the break_detect_mode config).
+        """
+        self._l.info(f"Scanning directory {dir_path} for breaks")
+        if not os.path.isdir(dir_path):
+            raise FileNotFoundError(f"Directory does not exist {dir_path}")
+        dir_path = os.path.realpath(dir_path)
+        file_list = [rpath for (_fp, rpath, _sz, _mt) in MediaProcessor.walk_media(dir_path, True, False)]
+
+        with DBPool.connect(self.db_path) as connection:
             # Check the cache because we require the duration to prococess.
-            file_paths = [os.path.realpath(file) for file in file_list]
-            cached_files = {}
-            for path in file_paths:
-                cached = FluidStatements.check_file_cache(connection, path)
-                if cached:
-                    cached_files[path] = cached
-
-            for file in file_list:
-                rfp = os.path.realpath(file)
-                if rfp in cached_files:
-                    cached = cached_files[rfp]
-                    if FluidStatements.get_break_points(connection, rfp):
-                        self._l.info(f"Breaks already exists for {rfp}")
+            durations = FluidStatements.get_cached_durations(connection, file_list)
+            already_scanned = FluidStatements.get_break_point_paths(connection, file_list)
+
+        to_scan = []
+        for rfp in file_list:
+            if rfp not in durations:
+                self._l.warning(f"{rfp} is not in catalog cache - not adding break points.")
+            elif rfp in already_scanned:
+                self._l.debug(f"Breaks already exists for {rfp}")
+            else:
+                to_scan.append(rfp)
+
+        (workers, threads) = FluidBuilder.break_scan_budget(workers, threads)
+        if not mode:
+            mode = StationManager().server_conf.get("break_detect_mode", "full")
+        self._l.info(
+            f"{len(already_scanned)} files already scanned - scanning {len(to_scan)} more "
+            f"with {workers} workers using {threads} threads each"
+        )
+
+        completed = 0
+        if progress:
+            progress(completed, len(to_scan), None)
+        if not len(to_scan):
+            return
+
+        with DBPool.connect(self.db_path) as connection:
+            # spawned, not forked - the caller may hold rich or logging locks that a forked child would inherit
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                futures = {
+                    pool.submit(MediaProcessor.black_detect, rfp, durations[rfp], threads=threads, mode=mode): rfp
+                    for rfp in to_scan
+                }
+                for future in as_completed(futures):
+                    rfp = futures[future]
+                    breaks = future.result()
+                    if breaks is None:
+                        self._l.warning(f"Break detection failed for {rfp} - it will be retried on the next scan")
                     else:
-                        breaks = MediaProcessor.black_detect(rfp, cached.duration)
+                        # checkpoint every finished file
                         FluidStatements.add_break_points(connection, rfp, breaks)
-                else:
-                    self._l.warning(f"{rfp} is not in catalog cache - not adding break points.")
-            connection.commit()
+                    completed += 1
+                    if progress:
+                        progress(completed, len(to_scan), rfp)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
 
     def get_breaks(self, full_path):
         #fname = os.path.realpath(fname)
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             results = FluidStatements.get_break_points(connection, full_path)
         return results
 
@@ -12,6 +12,7 @@ class FileRepoEntry:
             self.last_checked: datetime.datetime = None
             self.last_updates: datetime.datetime = None
             self.meta = ""
+            self.fingerprint: str = None
         else:
             self.from_db_row(db_row)
 
@@ -31,7 +32,9 @@ class FileRepoEntry:
             self.last_checked,
             self.last_updates,
             self.meta,
-        ) = row
+        ) = row[:8]
+        # rows from before the fingerprint column was added
+        self.fingerprint = row[8] if len(row) > 8 else None
 
     def to_db_row(self):
         return (
@@ -43,6 +46,7 @@ class FileRepoEntry:
             self.last_checked,
             self.last_updates,
             self.meta,
+            self.fingerprint,
         )
 
     def to_stat_check(self):
@@ -10,6 +10,14 @@ from fs42.fluid_objects import FileRepoEntry
 class FluidStatements:
     """Basic static SQL functions for interacting with the Fluid catalog DB"""
 
+    # stays under the sqlite host parameter limit for IN (...) lookups
+    chunk_size = 900
+    _has_meta = "(meta IS NOT NULL AND meta != '')"
+    _has_fingerprint = "(fingerprint IS NOT NULL)"
+    _row_marks = ", ".join("?" * 9)
+    # removed files that can still be matched as moves - trim_file_entries deletes them
+    _kept_for_moves = "(fingerprint IS NOT NULL OR path IN (SELECT path FROM break_points))"
+
     @staticmethod
     def check_file_cache(connection: sqlite3.Connection, full_path) -> FileRepoEntry:
         """Find full_path and return fullpath if its in the file cache"""
@@ -25,28 +33,206 @@ class FluidStatements:
         return result
 
     @staticmethod
-    def iterate_file_entries(connection: sqlite3.Connection, entries: list[FileRepoEntry]) -> None:
-        """Takes a list of file entries, determines if they are cached and adds them if not."""
+    def iterate_file_entries(connection: sqlite3.Connection, entries: list[FileRepoEntry], dir_path=None) -> dict:
+        """Reconciles a scan against the cache as sets - only the added and changed files are probed.
 
-        cursor = connection.cursor()
+        New paths are fingerprinted first: one matching a cached file that is gone from disk is treated
+        as a move and keeps its duration, metadata and break points, while one matching a file that is
+        still there copies them as a duplicate. When dir_path is given (a realpath), cached files under it
+        that are no longer on disk are removed - unless they have a fingerprint or break points, then
+        trim_file_entries removes them so a later scan of another folder can still pick them up as moves.
+        Everything is applied in a single transaction and the delta counts are returned - missing files that
+        stay behind for move matching count as "kept", not "removed".
+        """
+        _l = logging.getLogger("FLUID")
+        cached = FluidStatements.load_stat_checks(connection, [e.path for e in entries], dir_path)
+
+        to_add = []
+        to_update = []
+        to_fingerprint = []
         for entry in entries:
-            # see if there is an entry already
-            cursor.execute("SELECT * FROM file_meta WHERE path = ?;", (entry.path,))
-            row = cursor.fetchone()
-            if row:
-                repo_entry = FileRepoEntry()
-                repo_entry.from_db_row(row)
-
-                # compare it to the stats in the repo
-                if entry != repo_entry:
-                    # then the stats match
-                    
-                    FluidStatements.update_file_entry(connection, entry)
+            stat_check = cached.get(entry.path, None)
+            if stat_check is None:
+                to_add.append(entry)
+            elif stat_check[:3] != entry.to_stat_check() or not stat_check[3]:
+                # rows cached before probe metadata was stored get refreshed once
+                to_update.append(entry)
+            elif not stat_check[4]:
+                to_fingerprint.append(entry)
+
+        to_remove = []
+        if dir_path is not None:
+            found = {e.path for e in entries}
+            to_remove = [path for path in cached if path not in found and not os.path.exists(path)]
+
+        # fingerprints only read a couple of blocks per file, so do them ahead of probing
+        needs_fingerprint = to_add + to_update + to_fingerprint
+        fingerprints = MediaProcessor.map_pool(
+            MediaProcessor.fingerprint, [(e.path, e.size) for e in needs_fingerprint]
+        )
+        for entry, fingerprint in zip(needs_fingerprint, fingerprints):
+            entry.fingerprint = fingerprint
 
+        known = FluidStatements.load_fingerprints(connection, {e.fingerprint for e in to_add if e.fingerprint})
+        moves = []
+        copies = []
+        claimed = set()
+        pending = []
+        for entry in to_add:
+            matches = [m for m in known.get(entry.fingerprint, []) if m[0] not in claimed]
+            gone = [m for m in matches if not os.path.exists(m[0])]
+            if len(gone):
+                claimed.add(gone[0][0])
+                moves.append((gone[0], entry))
+            elif len(matches):
+                copies.append((matches[0], entry))
             else:
-                
-                FluidStatements.add_file_entry(connection, entry)
+                pending.append(entry)
+        to_remove = [path for path in to_remove if path not in claimed]
+
+        # probe only what is left of the delta, in parallel
+        pending += to_update
+        _l.info(
+            f"Cache delta: {len(to_add)} new ({len(moves)} moved, {len(copies)} duplicates), "
+            f"{len(to_update)} changed, {len(to_remove)} missing"
+        )
+        probed = MediaProcessor.map_pool(MediaProcessor.process_one, [(e.path, "processing", []) for e in pending])
+        processed = dict(zip([e.path for e in pending], probed))
+
+        now = datetime.datetime.now()
+        inserts = []
+        for entry in to_add:
+            if processed.get(entry.path, None):
+                entry.duration = processed[entry.path].duration
+                entry.meta = FluidStatements.meta_to_json(processed[entry.path].meta)
+                entry.first_added = now
+                entry.last_checked = now
+                entry.last_updates = now
+                inserts.append(entry.to_db_row())
+
+        updates = []
+        for entry in to_update:
+            if processed[entry.path]:
+                entry.duration = processed[entry.path].duration
+                entry.meta = FluidStatements.meta_to_json(processed[entry.path].meta)
+                updates.append(
+                    (entry.duration, entry.size, entry.last_mod, now, now, entry.meta, entry.fingerprint, entry.path)
+                )
+
+        # unchanged rows cached before fingerprints existed only need the new column
+        backfill = [(e.fingerprint, e.path) for e in to_fingerprint if e.fingerprint]
+
+        with connection:
+            cursor = connection.cursor()
+            cursor.executemany(f"INSERT OR REPLACE INTO file_meta VALUES ({FluidStatements._row_marks});", inserts)
+            cursor.executemany(
+                """UPDATE file_meta SET duration=?, size=?, last_mod=?, last_updated=?, last_checked=?, meta=?,
+                fingerprint=? WHERE path=?;""",
+                updates,
+            )
+            cursor.executemany("UPDATE file_meta SET fingerprint=? WHERE path=?;", backfill)
+            for (old_path, _duration, _meta), entry in moves:
+                _l.info(f"Matched moved file {old_path} -> {entry.path}")
+                cursor.execute(
+                    """UPDATE file_meta SET path=?, size=?, last_mod=?, last_updated=?, last_checked=?, fingerprint=?
+                    WHERE path=?;""",
+                    (entry.path, entry.size, entry.last_mod, now, now, entry.fingerprint, old_path),
+                )
+                cursor.execute("UPDATE OR REPLACE break_points SET path=? WHERE path=?;", (entry.path, old_path))
+            for (source_path, duration, meta), entry in copies:
+                entry.duration = duration
+                entry.meta = meta
+                entry.first_added = now
+                entry.last_checked = now
+                entry.last_updates = now
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO file_meta VALUES ({FluidStatements._row_marks});", entry.to_db_row()
+                )
+                cursor.execute(
+                    "INSERT OR REPLACE INTO break_points SELECT ?, points, last_updated FROM break_points WHERE path=?;",
+                    (entry.path, source_path),
+                )
+            # fingerprinted files wait for trim_file_entries in case they turn up somewhere else
+            cursor.executemany(
+                f"DELETE FROM file_meta WHERE path=? AND NOT {FluidStatements._kept_for_moves};",
+                [(p,) for p in to_remove],
+            )
+            removed = cursor.rowcount if len(to_remove) else 0
+            cursor.close()
+
+        return {
+            "added": len(inserts) + len(copies),
+            "moved": len(moves),
+            "updated": len(updates),
+            "removed": removed,
+            "kept": len(to_remove) - removed,
+            "failed": len(pending) - len(inserts) - len(updates),
+            "unchanged": len(entries) - len(to_add) - len(to_update),
+        }
+
+    @staticmethod
+    def load_stat_checks(connection: sqlite3.Connection, paths: list[str], dir_path=None) -> dict:
+        """Loads (path, size, last_mod, has_meta, has_fingerprint) for everything cached under dir_path plus any of paths outside it."""
+        cursor = connection.cursor()
+        cached = {}
+        outside = paths
+        if dir_path is not None:
+            # a range on the primary key keeps this to a single index scan
+            prefix = dir_path.rstrip("/") + "/"
+            upper = prefix[:-1] + chr(ord("/") + 1)
+            cursor.execute(
+                f"SELECT path, size, last_mod, {FluidStatements._has_meta}, {FluidStatements._has_fingerprint} FROM file_meta WHERE path >= ? AND path < ?;",
+                (prefix, upper),
+            )
+            for row in cursor.fetchall():
+                cached[row[0]] = tuple(row)
+            outside = [p for p in paths if not p.startswith(prefix)]
+
+        # symlinked files can resolve outside of the directory - look those up in chunks
+        for i in range(0, len(outside), FluidStatements.chunk_size):
+            chunk = outside[i : i + FluidStatements.chunk_size]
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT path, size, last_mod, {FluidStatements._has_meta}, {FluidStatements._has_fingerprint} FROM file_meta WHERE path IN ({marks});",
+                chunk,
+            )
+            for row in cursor.fetchall():
+                cached[row[0]] = tuple(row)
+        cursor.close()
+        return cached
+
+    @staticmethod
+    def load_fingerprints(connection: sqlite3.Connection, fingerprints: set) -> dict:
+        """Returns {fingerprint: [(path, duration, meta)]} for the cached files with any of these fingerprints"""
+        cursor = connection.cursor()
+        found = {}
+        fingerprints = list(fingerprints)
+        for i in range(0, len(fingerprints), FluidStatements.chunk_size):
+            chunk = fingerprints[i : i + FluidStatements.chunk_size]
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT fingerprint, path, duration, meta FROM file_meta WHERE fingerprint IN ({marks});", chunk
+            )
+            for fingerprint, path, duration, meta in cursor.fetchall():
+                found.setdefault(fingerprint, []).append((path, duration, meta))
+        cursor.close()
+        return found
+
+    @staticmethod
+    def find_duplicates(connection: sqlite3.Connection) -> list[list[str]]:
+        """Groups the cached files that share a fingerprint - largest files first"""
+        cursor = connection.cursor()
+        cursor.execute("""SELECT fingerprint, path FROM file_meta WHERE fingerprint IN (
+                            SELECT fingerprint FROM file_meta WHERE fingerprint IS NOT NULL
+                            GROUP BY fingerprint HAVING COUNT(*) > 1)
+                          ORDER BY size DESC, fingerprint, path;""")
+        groups = {}
+        for fingerprint, path in cursor.fetchall():
+            # rows waiting on trim are not on disk any more
+            if os.path.exists(path):
+                groups.setdefault(fingerprint, []).append(path)
         cursor.close()
+        return [paths for paths in groups.values() if len(paths) > 1]
 
     @staticmethod
     def trim_file_entries(connection: sqlite3.Connection, older_than: datetime):
@@ -64,37 +250,56 @@ class FluidStatements:
                 logging.getLogger("FLUID").info(f"File not found on filesystem - will remove: {repo_entry}")
                 to_remove.append(repo_entry.path)
 
-        connection.execute("BEGIN TRANSACTION;")
+        cursor.close()
 
-        for p in to_remove:
-            cursor.execute("DELETE from file_meta WHERE path=?", (p,))
+        with connection:
+            cursor = connection.cursor()
+            for p in to_remove:
+                cursor.execute("DELETE from file_meta WHERE path=?", (p,))
+                cursor.execute("DELETE from break_points WHERE path=?", (p,))
+            cursor.close()
 
-        cursor.close()
-        connection.commit()
+    @staticmethod
+    def remove_file_entries(connection: sqlite3.Connection, paths: list[str]):
+        """Removes each path, or everything cached below it when the path was a directory.
+
+        Files with a fingerprint or break points are left for trim_file_entries so a move can still be matched.
+        """
+        with connection:
+            for path in paths:
+                prefix = path.rstrip("/") + "/"
+                connection.execute(
+                    f"""DELETE FROM file_meta WHERE (path = ? OR (path >= ? AND path < ?))
+                    AND NOT {FluidStatements._kept_for_moves};""",
+                    (path, prefix, prefix[:-1] + chr(ord("/") + 1)),
+                )
 
     @staticmethod
-    def update_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
+    def update_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry, processed=False):
         """An old entry has changed, get the new stats and update it."""
         cursor = connection.cursor()
         now = datetime.datetime.now()
 
-        processed = MediaProcessor.process_one(entry.path, "processing", [])
+        if processed is False:
+            processed = MediaProcessor.process_one(entry.path, "processing", [])
         if not processed:
             return False
         entry.duration = processed.duration
+        entry.meta = FluidStatements.meta_to_json(processed.meta)
+        entry.fingerprint = MediaProcessor.fingerprint(entry.path, entry.size)
 
         logging.getLogger("FLUID").info(f"Updating existing file entry: {entry.path}")
 
-        update = """UPDATE file_meta SET duration=?, size=?, last_mod=?, last_updated=?, last_checked=? 
-        WHERE path=?;
+        update = """UPDATE file_meta SET duration=?, size=?, last_mod=?, last_updated=?, last_checked=?, meta=?,
+        fingerprint=? WHERE path=?;
         """
-        values = (entry.duration, entry.size, entry.last_mod, now, now, entry.path)
+        values = (entry.duration, entry.size, entry.last_mod, now, now, entry.meta, entry.fingerprint, entry.path)
         cursor.execute(update, values)
         cursor.close()
         connection.commit()
 
     @staticmethod
-    def add_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
+    def add_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry, processed=False):
         """This file isn't in the cache - add it."""
         cursor = connection.cursor()
         now = datetime.datetime.now()
@@ -103,18 +308,67 @@ class FluidStatements:
         entry.last_checked = now
         entry.last_updates = now
 
-        processed = MediaProcessor.process_one(entry.path, "processing", [])
+        if processed is False:
+            processed = MediaProcessor.process_one(entry.path, "processing", [])
         if not processed:
             return False
 
         entry.duration = processed.duration
+        entry.meta = FluidStatements.meta_to_json(processed.meta)
+        entry.fingerprint = MediaProcessor.fingerprint(entry.path, entry.size)
 
         logging.getLogger("FLUID").info(f"Caching new file entry: {entry}")
 
-        cursor.execute("INSERT INTO file_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?);", entry.to_db_row())
+        cursor.execute(f"INSERT INTO file_meta VALUES ({FluidStatements._row_marks});", entry.to_db_row())
         cursor.close()
         connection.commit()
 
+    @staticmethod
+    def get_cached_durations(connection: sqlite3.Connection, paths: list[str]) -> dict:
+        """Returns {path: duration} for every path that is in the file cache."""
+        cursor = connection.cursor()
+        durations = {}
+        for i in range(0, len(paths), FluidStatements.chunk_size):
+            chunk = paths[i : i + FluidStatements.chunk_size]
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(f"SELECT path, duration FROM file_meta WHERE path IN ({marks});", chunk)
+            durations.update(dict(cursor.fetchall()))
+        cursor.close()
+        return durations
+
+    @staticmethod
+    def meta_to_json(meta) -> str:
+        # compact separators - this is stored for every file in the cache. A probe that found nothing
+        # still stores "{}", only rows cached before probe metadata existed are empty and get reprobed
+        return json.dumps(meta, separators=(",", ":")) if meta else "{}"
+
+    @staticmethod
+    def get_file_meta(connection: sqlite3.Connection, path: str) -> dict:
+        """Returns the stored probe metadata for path - empty if it isn't cached or was never probed"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT meta FROM file_meta WHERE path=?", (path,))
+        row = cursor.fetchone()
+        cursor.close()
+        if row and row[0]:
+            return json.loads(row[0])
+        return {}
+
+    @staticmethod
+    def get_break_point_paths(connection: sqlite3.Connection, paths: list[str]) -> set:
+        """Returns the paths that already have a completed break scan (including ones with no breaks)."""
+        cursor = connection.cursor()
+        scanned = set()
+        for i in range(0, len(paths), FluidStatements.chunk_size):
+            chunk = paths[i : i + FluidStatements.chunk_size]
+            marks = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT path FROM break_points WHERE path IN ({marks}) AND points IS NOT NULL AND points != 'null';",
+                chunk,
+            )
+            scanned.update(row[0] for row in cursor.fetchall())
+        cursor.close()
+        return scanned
+
     @staticmethod
     def add_break_points(connection: sqlite3.Connection, path: str, points: dict):
         """Add or update the break points for this file"""
@@ -143,27 +397,3 @@ class FluidStatements:
         cursor.execute("DELETE FROM break_points WHERE path=?", (path,))
         cursor.close()
         connection.commit()
-
-    @staticmethod
-    def init_db(connection: sqlite3.Connection):
-        cursor = connection.cursor()
-        cursor.execute("""CREATE TABLE IF NOT EXISTS file_meta ( 
-                            path TEXT PRIMARY KEY,
-                            duration REAL,
-                            size INTEGER,
-                            first_added TIMESTAMP,
-                            last_mod TIMESTAMP,
-                            last_checked TIMESTAMP,
-                            last_updated TIMESTAMP,
-                            meta TEXT
-                            )
-                            """)
-        
-        cursor.execute("""CREATE TABLE IF NOT EXISTS break_points (
-                            path TEXT REFERENCES file_meta(path) PRIMARY KEY,
-                            points TEXT,
-                            last_updated TIMESTAMP
-                            )
-                       """)
-
-        cursor.close()
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from fs42.schedule_hint import BumpHint, DayPartHint, MonthHint, QuarterHint, RangeHint
+
+
+class HintMask:
+    """
+    A hint list compiled into bit masks so checking a time slot is a couple of bit tests.
+
+    hours has a bit per hour of the day. days has a bit per day of a leap year (so every month/day
+    has a slot) for times after midnight, and midnights holds the same for exactly 00:00:00 - a
+    RangeHint's end day only matches at midnight. The masks are sampled from the hint classes
+    themselves, so they agree with hint(when) by construction.
+    """
+
+    __slots__ = ("hours", "days", "midnights")
+
+    # the year used to sample date hints, and the day of year offset for each month in it
+    sample_year = 2000
+    month_offsets = [0] + [(datetime(2000, m, 1) - datetime(2000, 1, 1)).days for m in range(1, 13)]
+    all_hours = (1 << 24) - 1
+    all_days = (1 << 366) - 1
+
+    hour_hints = (DayPartHint,)
+    date_hints = (MonthHint, QuarterHint, RangeHint)
+    always_hints = (BumpHint,)
+
+    # compiled masks shared by every entry with the same hints
+    _compiled = {}
+
+    def __init__(self, hours=all_hours, days=all_days, midnights=all_days):
+        self.hours = hours
+        self.days = days
+        self.midnights = midnights
+
+    @staticmethod
+    def day_index(when) -> int:
+        return HintMask.month_offsets[when.month] + when.day - 1
+
+    @staticmethod
+    def is_midnight(when) -> bool:
+        return when.hour == 0 and when.minute == 0 and when.second == 0 and when.microsecond == 0
+
+    def allows(self, when) -> bool:
+        return self.allows_at(when.hour, HintMask.day_index(when), HintMask.is_midnight(when))
+
+    def allows_at(self, hour, day, midnight) -> bool:
+        if not (self.hours >> hour) & 1:
+            return False
+        if midnight:
+            return bool((self.midnights >> day) & 1)
+        return bool((self.days >> day) & 1)
+
+    @staticmethod
+    def compile(hints):
+        """Returns the HintMask for a hint list, or None if it has a hint type that can't be compiled"""
+        try:
+            key = tuple(tuple(sorted(hint.toJSON().items())) for hint in hints)
+        except AttributeError:
+            return None
+        if key not in HintMask._compiled:
+            HintMask._compiled[key] = HintMask._build(hints)
+        return HintMask._compiled[key]
+
+    @staticmethod
+    def _build(hints):
+        mask = HintMask()
+        for hint in hints:
+            if isinstance(hint, HintMask.always_hints):
+                continue
+            elif isinstance(hint, HintMask.hour_hints):
+                mask.hours &= HintMask._sample_hours(hint)
+            elif isinstance(hint, HintMask.date_hints):
+                mask.days &= HintMask._sample_days(hint, 12)
+                mask.midnights &= HintMask._sample_days(hint, 0)
+            else:
+                return None
+        return mask
+
+    @staticmethod
+    def _sample_hours(hint) -> int:
+        bits = 0
+        for hour in range(24):
+            if hint.hint(datetime(HintMask.sample_year, 1, 1, hour)):
+                bits |= 1 << hour
+        return bits
+
+    @staticmethod
+    def _sample_days(hint, hour) -> int:
+        bits = 0
+        when = datetime(HintMask.sample_year, 1, 1, hour)
+        for day in range(366):
+            if hint.hint(when + timedelta(days=day)):
+                bits |= 1 << day
+        return bits
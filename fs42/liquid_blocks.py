@@ -60,8 +60,8 @@ class LiquidBlock:
         # ensure start ordering
         break_points = MediaProcessor.calc_black_segments(break_points, content_duration)
 
-        # then remove the ones with the shortest segment duration until we have fewer than max_breaks
-        sorted_breaks = sorted(break_points, key=lambda k: k["segment_duration"], reverse=True)
+        # then remove the ones with the shortest segment duration (weighted by black/silence score) until we have fewer than max_breaks
+        sorted_breaks = sorted(break_points, key=lambda k: k["segment_duration"] * k.get("score", 1.0), reverse=True)
         clipped_breaks = sorted_breaks[: int(max_breaks)]
         # and put it back in place
         break_points = sorted(clipped_breaks, key=lambda k: k["black_start"])
@@ -1,11 +1,13 @@
-import sqlite3
 import json
 from datetime import datetime
+from fs42.db_pool import DBPool
+from fs42.migrations import Migrations
 from fs42.station_manager import StationManager
 from fs42.liquid_blocks import LiquidBlock, LiquidLoopBlock, LiquidClipBlock, LiquidOffAirBlock
 from fs42.block_plan import BlockPlanEntry
 from fs42.catalog_api import CatalogAPI
 from fs42.title_parser import TitleParser
+from fs42.search_query import SearchQuery
 
 
 class LiquidIO:
@@ -16,49 +18,22 @@ class LiquidIO:
 
     def __init__(self):
         self.db_path = StationManager().server_conf["db_path"]
-        self._init_liquid_table()
-
-    def _init_liquid_table(self):
-        """
-        Creates a database table to hold liquid data.
-        """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-            cursor.execute("""CREATE TABLE IF NOT EXISTS liquid_blocks (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                station TEXT NOT NULL,
-                                liquid_type TEXT NOT NULL,
-                                start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                end_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                break_strategy TEXT NOT NULL,
-                                title TEXT NOT NULL,
-                                sequence_key TEXT,
-                                break_info TEXT,
-                                content_json TEXT NOT NULL,
-                                plan_json TEXT NOT NULL
-                            )""")
-            cursor.close()
-            connection.commit()
+        self.has_fts = "liquid_blocks_fts" in Migrations.ensure(self.db_path)
 
     def get_liquid_blocks(self, station_name: str) -> list[LiquidBlock]:
         """
         Retrieve liquid blocks from the database for a given station.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute("SELECT * FROM liquid_blocks WHERE station = ?", (station_name,))
             rows = cursor.fetchall()
             cursor.close()
 
-            liquid_blocks = []
-            for row in rows:
-                block = LiquidIO._build_block_from_row(row)
-                liquid_blocks.append(block)
-
-            return liquid_blocks
+        return LiquidIO._build_blocks(rows)
 
     def query_liquid_blocks(self, station_name: str, start: str, end: str) -> list[LiquidBlock]:
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 "SELECT * FROM liquid_blocks WHERE station = ? AND start_time < ? AND end_time > ?",
@@ -67,69 +42,79 @@ class LiquidIO:
             rows = cursor.fetchall()
             cursor.close()
 
-            liquid_blocks = []
-            for row in rows:
-                block = LiquidIO._build_block_from_row(row)
-                liquid_blocks.append(block)
-
-            return liquid_blocks
+        return LiquidIO._build_blocks(rows)
 
     def put_liquid_blocks(self, station_name: str, liquid_blocks: list[LiquidBlock]):
         """
         Store liquid blocks in the database.
         """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-
+        def rows():
             for block in liquid_blocks:
-
                 if block.content and not isinstance(block.content, list):
                     content_json = json.dumps(block.content.dbid)
-
                 elif block.content:
                     content_json = json.dumps([c.dbid for c in block.content])
                 else:
                     content_json = None
 
-
-                # plan_json = json.dumps(block.plan.toJSON()) if block.plan else None
-                plan_json = json.dumps([p.toJSON() for p in block.plan])
-                block_type = type(block).__name__
-
-                break_info = json.dumps(block.break_info) if block.break_info else None
-                seq_json = json.dumps(block.sequence_key) if block.sequence_key else None
-               
-                cursor.execute(
-                    """INSERT OR REPLACE INTO liquid_blocks 
-                       (station, liquid_type, start_time, end_time, break_strategy, title, sequence_key, break_info, content_json, plan_json) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        station_name,
-                        block_type,
-                        block.start_time,
-                        block.end_time,
-                        block.break_strategy,
-                        block.title,
-                        seq_json,
-                        break_info,
-                        content_json,
-                        plan_json,
-                    ),
+                yield (
+                    station_name,
+                    type(block).__name__,
+                    block.start_time,
+                    block.end_time,
+                    block.break_strategy,
+                    block.title,
+                    json.dumps(block.sequence_key) if block.sequence_key else None,
+                    json.dumps(block.break_info) if block.break_info else None,
+                    content_json,
+                    json.dumps([p.toJSON() for p in block.plan]),
                 )
+
+        with DBPool.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            DBPool.write_chunks(
+                cursor,
+                """INSERT OR REPLACE INTO liquid_blocks 
+                   (station, liquid_type, start_time, end_time, break_strategy, title, sequence_key, break_info, content_json, plan_json) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows(),
+            )
             cursor.close()
             connection.commit()
+        DBPool.checkpoint(self.db_path)
 
     def delete_liquid_blocks(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DBPool.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute("DELETE FROM liquid_blocks WHERE station = ?", (station_name,))
             cursor.close()
             connection.commit()
 
     @staticmethod
-    def _build_block_from_row(row):
+    def _content_ids(content_json) -> list:
+        if not content_json:
+            return []
+        if not isinstance(content_json, list):
+            return [int(content_json)]
+        return [int(entry) for entry in content_json]
+
+    @staticmethod
+    def _build_blocks(rows) -> list[LiquidBlock]:
+        """
+        Builds blocks for rows with every catalog entry they reference fetched up front in a few IN
+        queries. Blocks that reference the same entry share one CatalogEntry.
+        """
+        entry_ids = set()
+        for row in rows:
+            entry_ids.update(LiquidIO._content_ids(json.loads(row[9]) if row[9] else None))
+        entries = CatalogAPI.get_entries_by_ids(entry_ids) if entry_ids else {}
+        return [LiquidIO._build_block_from_row(row, entries) for row in rows]
+
+    @staticmethod
+    def _build_block_from_row(row, entries=None):
         """
         Helper method to build a LiquidBlock from a database row.
+        entries is an {id: CatalogEntry} map of prefetched content - without it each entry is looked up.
         """
         _id = row[0]
         _station = row[1]
@@ -144,17 +129,19 @@ class LiquidIO:
         _plan_json = json.loads(row[10]) if row[10] else []
     
 
+        def lookup(entry_id):
+            if entries is None:
+                return CatalogAPI.get_entry_by_id(entry_id)
+            return entries.get(entry_id, None)
+
         content_obj = None
         if _content_json:
             if not isinstance(_content_json, list):
                 # If the content is a single LiquidBlock
-                content_obj = CatalogAPI.get_entry_by_id(int(_content_json))
+                content_obj = lookup(int(_content_json))
             else:
                 # or if its a list of blocks
-                content_obj = []
-                for entry in _content_json:
-                    # content_obj.append(CatalogEntry.from_json_dict(entry))
-                    content_obj.append(CatalogAPI.get_entry_by_id(int(entry)))  
+                content_obj = [lookup(entry_id) for entry_id in LiquidIO._content_ids(_content_json)]
 
         args = (
             content_obj,
@@ -188,44 +175,67 @@ class LiquidIO:
             case _:
                 raise ValueError(f"Unknown liquid type: {liquid_type}")
 
-    def search_liquid_blocks(self, station_name: str, query: str) -> list[LiquidBlock]:
-        """
-        Search liquid blocks by title for a given station.
-        """
-        with sqlite3.connect(self.db_path) as connection:
+    # the columns a search result needs - content and plans are never decoded
+    _search_columns = (
+        "liquid_blocks.id, liquid_blocks.station, liquid_blocks.liquid_type, "
+        "liquid_blocks.start_time, liquid_blocks.end_time, liquid_blocks.title"
+    )
+
+    def _search_rows(self, query: str, station_name: str = None) -> list:
+        where = []
+        args = []
+        if self.has_fts:
+            match = SearchQuery.to_match(query)
+            if not match:
+                return []
+            source = "liquid_blocks_fts JOIN liquid_blocks ON liquid_blocks.id = liquid_blocks_fts.rowid"
+            where.append("liquid_blocks_fts MATCH ?")
+            args.append(match)
+        else:
+            source = "liquid_blocks"
+            where.append("liquid_blocks.title LIKE ?")
+            args.append(f"%{query}%")
+
+        if station_name:
+            where.append("liquid_blocks.station = ?")
+            args.append(station_name)
+
+        with DBPool.connect(self.db_path, readonly=True) as connection:
             cursor = connection.cursor()
             cursor.execute(
-                "SELECT * FROM liquid_blocks WHERE station = ? AND title LIKE ? ORDER BY start_time", 
-                (station_name, f"%{query}%")
+                f"SELECT {LiquidIO._search_columns} FROM {source} WHERE {' AND '.join(where)} "
+                "ORDER BY liquid_blocks.station, liquid_blocks.start_time",
+                args,
             )
             rows = cursor.fetchall()
             cursor.close()
+        return rows
 
-        blocks = []
-        for row in rows:
-            blocks.append(LiquidIO._build_block_from_row(row))
-
-        return blocks
+    @staticmethod
+    def _search_result(row) -> dict:
+        (block_id, station, liquid_type, start_time, end_time, title) = row
+        return {
+            "id": block_id,
+            "station": station,
+            "liquid_type": liquid_type,
+            "start_time": datetime.fromisoformat(start_time),
+            "end_time": datetime.fromisoformat(end_time),
+            "title": TitleParser.parse_title(title),
+        }
+
+    def search_liquid_blocks(self, station_name: str, query: str) -> list[dict]:
+        """
+        Search liquid blocks by title for a given station - words in query match title words by prefix.
+        Returns light rows (id, station, liquid_type, start_time, end_time and title) in start time order.
+        """
+        return [LiquidIO._search_result(row) for row in self._search_rows(query, station_name)]
 
     def search_all_liquid_blocks(self, query: str) -> dict:
         """
         Search liquid blocks by title across all stations.
-        Returns a dictionary with station names as keys and lists of blocks as values.
+        Returns a dictionary with station names as keys and lists of light rows as values.
         """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-            cursor.execute(
-                "SELECT * FROM liquid_blocks WHERE title LIKE ? ORDER BY station, start_time", 
-                (f"%{query}%",)
-            )
-            rows = cursor.fetchall()
-            cursor.close()
-
         results = {}
-        for row in rows:
-            station = row[1]  # station is at index 1
-            if station not in results:
-                results[station] = []
-            results[station].append(LiquidIO._build_block_from_row(row))
-
+        for row in self._search_rows(query):
+            results.setdefault(row[1], []).append(LiquidIO._search_result(row))
         return results
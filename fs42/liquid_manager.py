@@ -93,7 +93,7 @@ class LiquidManager(object):
             if _block.start_time > now:
                 # does it have a sequence and is that sequence in the catalog?
 
-                if _block.sequence_key:
+                if _block.sequence_key and _block.content:
                     # make sure its in the store
                     #seq = SequenceAPI.get_sequence(
                     #    station_config, _block.sequence_key["sequence_name"], _block.sequence_key["tag_path"]
@@ -11,7 +11,6 @@ from fs42.slot_reader import SlotReader
 from fs42 import timings
 from fs42.liquid_blocks import LiquidBlock, LiquidClipBlock, LiquidOffAirBlock, LiquidLoopBlock
 from fs42.sequence_api import SequenceAPI
-from fs42.catalog_api import CatalogAPI
 from fs42.liquid_api import LiquidAPI
 from fs42.marathon_agent import MarathonAgent
 
@@ -80,6 +79,9 @@ class LiquidSchedule:
             next_seq = SequenceAPI.get_next_in_sequence(self.conf, seq_name, tag_str)
             if next_seq:
                 candidate = self.catalog.entry_by_fpath(next_seq.fpath)
+                if candidate:
+                    # sequence picks skip find_candidate, so count them here
+                    self.catalog.play_counts.record(candidate)
 
             seq_key = SequenceAPI.make_sequence_key(self.conf, seq_name, tag_str)
         else:
@@ -195,18 +197,14 @@ class LiquidSchedule:
             current_mark = next_mark
         self._l.info("Content and reel schedules are completed")
 
-        # now, make plans for all the blocks and make list to update play counts
+        # now, make plans for all the blocks - reel picks are counted as they are made
         self._l.info(f"Building plans for {len(new_blocks)} new schedule blocks")
-        play_counts = []
 
         for block in new_blocks:
             block.make_plan(self.catalog)
-            if block.content:
-                # if the block has content, then we need to increment the play count
-                play_counts.append(block.content)
 
         self._l.debug("Plans completed - updating play counts")
-        CatalogAPI.update_play_counts(self.conf, play_counts)
+        self.catalog.save_play_counts()
         self._l.debug("Counts updated")
         self._blocks = new_blocks
         self._l.info("Saving blocks to disk")
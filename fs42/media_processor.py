@@ -1,29 +1,40 @@
+import hashlib
 import logging
 import os
-import glob
+import re
 import ffmpeg
+from concurrent.futures import ThreadPoolExecutor
 from fs42.fluid_objects import FileRepoEntry
 from fs42 import timings
 
-try:
-    # try to import from version > 2.0
-    from moviepy import VideoFileClip
-except ImportError:
-    # fall back to import from version 1.0
-    from moviepy.editor import VideoFileClip  # type: ignore
-
 from fs42.schedule_hint import MonthHint, QuarterHint, RangeHint, BumpHint, DayPartHint
 from fs42.catalog_entry import CatalogEntry
+from fs42.station_manager import StationManager
 
 
 class MediaProcessor:
     supported_formats = ["mp4", "mpg", "mpeg", "avi", "mov", "mkv", "ts", "m4v", "webm", "wmv"]
+    black_detect_modes = ["full", "fast", "keyframes"]
+    # frame width used by the fast black detection pass and the seconds decoded around each candidate
+    fast_black_width = 160
+    fast_black_refine_pad = 2.0
+    # silencedetect settings and the black/silence overlap a break needs to count
+    silence_noise_db = -50
+    silence_min_duration = 0.1
+    silence_min_score = 0.25
+    _silence_start = re.compile(r"silence_start:\s*(-?[\d.]+)")
+    _silence_end = re.compile(r"silence_end:\s*(-?[\d.]+)")
+    # seconds of packets read by probe_one to estimate the keyframe interval
+    keyframe_probe_seconds = 10
+    # bytes hashed from each end of a file for its content fingerprint
+    fingerprint_block = 64 * 1024
 
     def process_one(fname, tag, hints, fluid=None) -> CatalogEntry:
         _l = logging.getLogger("MEDIA")
         _l.debug(f"--process_one is working on {fname}")
         # get video file length in seconds
         duration = 0.0
+        meta = None
         result = None
         try:
             full_path = False
@@ -35,16 +46,11 @@ class MediaProcessor:
 
             if not duration:
                 # then do the processing
-                duration = MediaProcessor._get_duration(fname)
+                (duration, meta) = MediaProcessor.probe_one(fname)
 
-            # it might not support streams, so check with moviepy
+            # every ffprobe tier came up empty, so decode it with moviepy as a last resort
             if duration <= 0.0:
-                try:
-                    video_clip = VideoFileClip(fname)
-                    duration = video_clip.duration
-                except Exception as e:
-                    _l.error(f"Error in moviepy attempting to get duration for {fname}")
-                    _l.exception(e)
+                duration = MediaProcessor._moviepy_duration(fname)
             # see if both returned 0
             if duration <= 0.0:
                 _l.warning(f"Could not get a duration for tag: {tag}  file: {fname}")
@@ -53,6 +59,7 @@ class MediaProcessor:
                 show_clip = CatalogEntry(fname, duration, tag, hints)
                 result = show_clip
                 result.realpath = full_path
+                result.meta = meta
                 _l.debug(f"--_process_media is done with {fname}: {show_clip}")
 
         except Exception as e:
@@ -61,26 +68,51 @@ class MediaProcessor:
 
         return result
 
+    @staticmethod
+    def probe_worker_count(workers=None) -> int:
+        # explicit argument wins, then main config, then one worker per core
+        if workers is None:
+            workers = StationManager().server_conf.get("probe_workers", None)
+        if not workers:
+            workers = os.cpu_count() or 1
+        return max(1, int(workers))
+
+    @staticmethod
+    def map_pool(fn, arg_list, workers=None) -> list:
+        """Runs fn over each argument tuple on a bounded thread pool - results keep the input ordering"""
+        workers = min(MediaProcessor.probe_worker_count(workers), len(arg_list))
+        if workers <= 1:
+            return [fn(*args) for args in arg_list]
+
+        # ffprobe runs as a subprocess, so threads are enough to keep every core busy
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda args: fn(*args), arg_list))
+
     @staticmethod
     def _process_media(file_list, tag, hints=[], fluid=None) -> list[CatalogEntry]:
+        return MediaProcessor._process_jobs([(fname, hints) for fname in file_list], tag, fluid)
+
+    @staticmethod
+    def _process_jobs(jobs, tag, fluid=None) -> list[CatalogEntry]:
+        # jobs is a list of (file name, hints) pairs that all belong to tag
         _l = logging.getLogger("MEDIA")
-        _l.debug(f"_process_media starting processing for tag={tag} on {len(file_list)} files")
+        _l.debug(f"_process_media starting processing for tag={tag} on {len(jobs)} files")
         show_clip_list = []
 
         # collect list of files that fail
         failed = []
 
         # get the duration and path for each clip and add to the tag
-        for fname in file_list:
-            _l.debug(f"--_process_media is working on {fname}")
-            # get video file length in seconds
-            results = MediaProcessor.process_one(fname, tag, hints, fluid)
+        arg_list = [(fname, tag, hints, fluid) for (fname, hints) in jobs]
+        processed = MediaProcessor.map_pool(MediaProcessor.process_one, arg_list)
+
+        for (fname, _hints), results in zip(jobs, processed):
             if results:
                 show_clip_list.append(results)
             else:
-                failed.append(failed)
+                failed.append(fname)
 
-        _l.debug(f"_process_media completed processing for tag={tag} on {len(file_list)} files")
+        _l.debug(f"_process_media completed processing for tag={tag} on {len(jobs)} files")
 
         if len(failed):
             _l.warning(f"Errors were encountered during processing - error count: {len(failed)}")
@@ -90,58 +122,266 @@ class MediaProcessor:
                 count_printed += 1
                 if count_printed >= 10:
                     _l.warning(f"and {len(failed) - count_printed} more...")
+                    break
 
         return show_clip_list
 
     @staticmethod
     def _get_duration(file_name) -> float:
-        probed = ffmpeg.probe(file_name)
+        (duration, _meta) = MediaProcessor.probe_one(file_name)
+        return duration
 
-        if "streams" in probed and len(probed["streams"]) and "duration" in probed["streams"][0]:
-            return float(probed["streams"][0]["duration"])
-        else:
-            return -1
+    @staticmethod
+    def probe_one(file_name):
+        """Single ffprobe call - returns (duration, meta) where meta is a compact summary of the streams
+
+        Packets from the first few seconds are included so the keyframe interval can be estimated
+        without decoding anything.
+        """
+        probed = ffmpeg.probe(
+            file_name,
+            show_entries="stream:format:packet=stream_index,pts_time,flags",
+            read_intervals=f"%+{MediaProcessor.keyframe_probe_seconds}",
+        )
+
+        meta = MediaProcessor._summarize_probe(probed)
+        return (MediaProcessor._probed_duration(file_name, probed, meta), meta)
 
     @staticmethod
-    def _find_media(path) -> list[str]:
-        logging.getLogger("MEDIA").debug(f"_find_media scanning for media in {path}")
-        file_list = []
-        for ext in MediaProcessor.supported_formats:
-            this_format = glob.glob(f"{path}/*.{ext}")
-            file_list += this_format
-            logging.getLogger("MEDIA").debug(
-                f"--Found {len(this_format)} files with {ext} extension - {len(file_list)} total found in {path} so far"
+    def _probed_duration(file_name, probed, meta) -> float:
+        # cheapest first: stream header, then the container, then counting packets (demux only, no decode)
+        for stream in probed.get("streams", []):
+            try:
+                duration = float(stream.get("duration", -1))
+            except ValueError:
+                continue
+            if duration > 0:
+                return duration
+
+        if meta["duration"] and meta["duration"] > 0:
+            return meta["duration"]
+
+        return MediaProcessor._packet_duration(file_name)
+
+    @staticmethod
+    def _packet_duration(file_name) -> float:
+        _l = logging.getLogger("MEDIA")
+        try:
+            probed = ffmpeg.probe(
+                file_name,
+                select_streams="v:0",
+                count_packets=None,
+                show_entries="stream=nb_read_packets,avg_frame_rate,r_frame_rate",
             )
+            stream = probed["streams"][0]
+            packets = int(stream["nb_read_packets"])
+            for rate in (stream.get("avg_frame_rate", ""), stream.get("r_frame_rate", "")):
+                (num, _sep, den) = rate.partition("/")
+                if float(num or 0) > 0 and float(den or 1) > 0:
+                    fps = float(num) / float(den or 1)
+                    _l.info(f"Estimated duration of {file_name} from {packets} packets at {fps:.3f} fps")
+                    return packets / fps
+        except (ffmpeg.Error, KeyError, IndexError, ValueError) as e:
+            _l.debug(f"Could not count packets for {file_name}: {e}")
+        return -1
+
+    @staticmethod
+    def _moviepy_duration(file_name) -> float:
+        _l = logging.getLogger("MEDIA")
+        try:
+            # moviepy is slow to import, so only load it when ffprobe could not help
+            try:
+                # try to import from version > 2.0
+                from moviepy import VideoFileClip
+            except ImportError:
+                # fall back to import from version 1.0
+                from moviepy.editor import VideoFileClip  # type: ignore
+
+            video_clip = VideoFileClip(file_name)
+            return video_clip.duration
+        except Exception as e:
+            _l.error(f"Error in moviepy attempting to get duration for {file_name}")
+            _l.exception(e)
+        return -1
+
+    @staticmethod
+    def fingerprint(file_name, size=None) -> str:
+        """Cheap content id - hashes the size with the first and last blocks, so moved or renamed files still match"""
+        block = MediaProcessor.fingerprint_block
+        digest = hashlib.sha1()
+        try:
+            with open(file_name, "rb") as f:
+                if size is None:
+                    size = os.fstat(f.fileno()).st_size
+                digest.update(str(size).encode())
+                digest.update(f.read(block))
+                if size > block:
+                    f.seek(max(block, size - block))
+                    digest.update(f.read(block))
+        except OSError as e:
+            logging.getLogger("MEDIA").warning(f"Could not fingerprint {file_name}: {e}")
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def _summarize_probe(probed) -> dict:
+        def number(value, cast=float):
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                return None
+
+        def frame_rate(rate):
+            # ffprobe reports rates as fractions like 30000/1001
+            if not rate or "/" not in rate:
+                return number(rate)
+            (num, den) = rate.split("/")
+            return round(float(num) / float(den), 3) if number(den) else None
+
+        container = probed.get("format", {})
+        meta = {
+            "format": container.get("format_name", None),
+            "duration": number(container.get("duration", None)),
+            "bit_rate": number(container.get("bit_rate", None), int),
+            "video": None,
+            "audio": [],
+        }
+
+        video_index = None
+        for stream in probed.get("streams", []):
+            codec_type = stream.get("codec_type", None)
+            if codec_type == "video" and meta["video"] is None:
+                # skip cover art - it shows up as a single frame video stream
+                if stream.get("disposition", {}).get("attached_pic", 0):
+                    continue
+                video_index = stream.get("index", None)
+                meta["video"] = {
+                    "codec": stream.get("codec_name", None),
+                    "width": number(stream.get("width", None), int),
+                    "height": number(stream.get("height", None), int),
+                    "fps": frame_rate(stream.get("avg_frame_rate", None))
+                    or frame_rate(stream.get("r_frame_rate", None)),
+                    "pix_fmt": stream.get("pix_fmt", None),
+                    "bit_rate": number(stream.get("bit_rate", None), int),
+                }
+            elif codec_type == "audio":
+                meta["audio"].append(
+                    {
+                        "codec": stream.get("codec_name", None),
+                        "channels": number(stream.get("channels", None), int),
+                        "sample_rate": number(stream.get("sample_rate", None), int),
+                    }
+                )
+
+        meta["keyframe_interval"] = MediaProcessor._keyframe_interval(probed.get("packets", []), video_index)
+        return meta
+
+    @staticmethod
+    def _keyframe_interval(packets, video_index):
+        # average spacing between the key frames seen in the probed window
+        if video_index is None:
+            return None
+        key_times = []
+        for packet in packets:
+            if packet.get("stream_index", None) == video_index and "K" in packet.get("flags", ""):
+                try:
+                    key_times.append(float(packet["pts_time"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        if len(key_times) < 2:
+            return None
+        key_times.sort()
+        return round((key_times[-1] - key_times[0]) / (len(key_times) - 1), 3)
+
+    @staticmethod
+    def walk_media(path, recursive=True, with_stat=True):
+        """Single pass over path yielding (path, realpath, size, mtime) for each supported media file.
 
+        Extensions match case-insensitively, hidden files and folders are skipped like glob does,
+        and size/mtime come from the same DirEntry that found the file (None when with_stat is False).
+        """
+        extensions = MediaProcessor._extension_set()
+        _l = logging.getLogger("MEDIA")
+
+        # (path as the caller spelled it, resolved path) - realpath is only recomputed across symlinks
+        to_visit = [(path, os.path.realpath(path))]
+        visited = set()
+        while to_visit:
+            (dir_path, real_dir) = to_visit.pop()
+            if real_dir in visited:
+                continue
+            visited.add(real_dir)
+
+            try:
+                with os.scandir(dir_path) as it:
+                    # scandir order depends on the filesystem - sort so files come out name ordered too
+                    dir_entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                _l.debug(f"walk_media could not read {dir_path}: {e}")
+                continue
+
+            subdirs = []
+            for entry in dir_entries:
+                if entry.name.startswith("."):
+                    continue
+                fpath = f"{dir_path}/{entry.name}"
+                try:
+                    if entry.is_dir():
+                        if recursive:
+                            subdirs.append((fpath, MediaProcessor._entry_realpath(entry, fpath, real_dir)))
+                        continue
+
+                    ext = os.path.splitext(entry.name)[1][1:].lower()
+                    if ext not in extensions:
+                        continue
+
+                    rpath = MediaProcessor._entry_realpath(entry, fpath, real_dir)
+                    if with_stat:
+                        stat = entry.stat()
+                        yield (fpath, rpath, stat.st_size, stat.st_mtime)
+                    else:
+                        yield (fpath, rpath, None, None)
+                except OSError as e:
+                    _l.debug(f"walk_media skipping {fpath}: {e}")
+
+            # keep a depth-first, name ordered walk so results are stable between runs
+            to_visit.extend(reversed(sorted(subdirs)))
+
+    @staticmethod
+    def _entry_realpath(entry, fpath, real_dir) -> str:
+        # only symlinks need the full resolution, everything else is relative to the resolved parent
+        if entry.is_symlink():
+            return os.path.realpath(fpath)
+        return os.path.join(real_dir, entry.name)
+
+    @staticmethod
+    def _extension_set() -> set:
+        return {ext.lower() for ext in MediaProcessor.supported_formats}
+
+    @staticmethod
+    def _find_media(path) -> list[str]:
+        logging.getLogger("MEDIA").debug(f"_find_media scanning for media in {path}")
+        file_list = [fpath for (fpath, _rp, _sz, _mt) in MediaProcessor.walk_media(path, False, False)]
         logging.getLogger("MEDIA").debug(f"_find_media done scanning {path} {len(file_list)}")
         return file_list
 
     @staticmethod
-    def rich_find_media(path: str) -> list[FileRepoEntry]:
-        file_list = MediaProcessor._rfind_media(path)
+    def rich_find_media(path: str, walked=None) -> list[FileRepoEntry]:
+        # walked can hand in the (path, realpath, size, mtime) tuples of a walk that already happened
         found_list = []
 
-        for fp in file_list:
+        for fpath, rpath, size, mtime in walked if walked is not None else MediaProcessor.walk_media(path):
             entry = FileRepoEntry()
-            entry.path = os.path.realpath(fp)
-            # get the full path:
-            stat = os.stat(fp)
-            entry.last_mod = stat.st_mtime
-            entry.size = stat.st_size
+            entry.path = rpath
+            entry.last_mod = mtime
+            entry.size = size
             found_list.append(entry)
         return found_list
 
     @staticmethod
     def _rfind_media(path) -> list[str]:
         logging.getLogger("MEDIA").debug(f"_rfind_media scanning for media in {path}")
-        file_list = []
-
-        # get all the files
-        for ext in MediaProcessor.supported_formats:
-            # this_format = directory.rglob(f"*.{ext}")
-            this_format = glob.glob(f"{path}/**/*.{ext}", recursive=True)
-            file_list += this_format
-
+        file_list = [fpath for (fpath, _rp, _sz, _mt) in MediaProcessor.walk_media(path, True, False)]
         logging.getLogger("MEDIA").debug(f"_rfind_media done scanning {path} {len(file_list)}")
         return file_list
 
@@ -166,12 +406,13 @@ class MediaProcessor:
     @staticmethod
     def _process_subs(dir_path, tag, bumpdir=False, fluid=None):
         subs = [f.path for f in os.scandir(dir_path) if f.is_dir()]
-        clips = []
+        # gather every sub folder first so the whole tag shares one probe pool
+        jobs = []
         for sub in subs:
             file_list = MediaProcessor._rfind_media(sub)
             hints = MediaProcessor._process_hints(sub, tag, bumpdir)
-            clips += MediaProcessor._process_media(file_list, tag, hints=hints, fluid=fluid)
-        return clips
+            jobs += [(fname, hints) for fname in file_list]
+        return MediaProcessor._process_jobs(jobs, tag, fluid=fluid)
 
     @staticmethod
     def _test_candidate_hints(hint_list, when):
@@ -218,7 +459,175 @@ class MediaProcessor:
         return break_points
 
     @staticmethod
-    def black_detect(fname, base_duration, black_min_duration=0.1, black_pixel_tresh=0.1, black_ratio_thresh=0.95):
+    def _parse_detect_lines(stderr, filter_name, required_keys):
+        # ffmpeg detect filters log lines like: [blackdetect @ 0x..] black_start:1.2 black_end:1.5 black_duration:0.3
+        _l = logging.getLogger("MEDIA")
+        found = []
+        for line in stderr.decode("utf-8").split("\n"):
+            if filter_name in line:
+                try:
+                    parts = line.split("]")[1].strip().split(" ")
+                    info = {}
+                    for part in parts:
+                        if ":" in part:
+                            key, value = part.split(":")
+                            info[key] = float(value)
+                    if info:
+                        if any(key not in info for key in required_keys):
+                            # then not a good line
+                            continue
+
+                        found.append(info)
+
+                except IndexError:
+                    _l.debug(f"Skipping malformed line: {line}")
+                    pass
+                except ValueError:
+                    _l.info(f"Skipping invalid data in line: {line}")
+                    pass
+                except Exception as e:
+                    _l.info(f"An unexpected error occurred while parsing line: {line}. Error: {e}")
+        return found
+
+    @staticmethod
+    def _parse_silence_lines(stderr, media_duration):
+        # silencedetect logs: silence_start: 12.3 and later silence_end: 14.1 | silence_duration: 1.8
+        silences = []
+        open_start = None
+        for line in stderr.decode("utf-8").split("\n"):
+            if "silencedetect" not in line:
+                continue
+            start_match = MediaProcessor._silence_start.search(line)
+            end_match = MediaProcessor._silence_end.search(line)
+            try:
+                if start_match:
+                    open_start = float(start_match.group(1))
+                elif end_match and open_start is not None:
+                    silences.append({"silence_start": open_start, "silence_end": float(end_match.group(1))})
+                    open_start = None
+            except ValueError:
+                logging.getLogger("MEDIA").debug(f"Skipping invalid data in line: {line}")
+        if open_start is not None:
+            # silence that runs to the end of the file never gets an end line
+            silences.append({"silence_start": open_start, "silence_end": media_duration})
+        return silences
+
+    @staticmethod
+    def score_black_silence(black_frames, silences, slack=0.25):
+        """Scores each black interval 0-1 by how much of it is also silent (audio may lead/lag by slack)"""
+        for info in black_frames:
+            black_len = max(info["black_duration"], 0.1)
+            overlap = 0.0
+            for silence in silences:
+                start = max(info["black_start"] - slack, silence["silence_start"])
+                end = min(info["black_end"] + slack, silence["silence_end"])
+                if end > start:
+                    overlap += end - start
+            info["score"] = round(min(1.0, overlap / black_len), 3)
+        return black_frames
+
+    @staticmethod
+    def _run_blackdetect(
+        fname,
+        black_min_duration,
+        black_pixel_tresh,
+        black_ratio_thresh,
+        threads=None,
+        scale_width=None,
+        keyframes_only=False,
+        seek=None,
+        window=None,
+        silence=False,
+    ):
+        # Build the ffmpeg command with blackdetect (and optionally silencedetect) filters
+        # threads caps the decoder and filter threads so several scans can share the machine
+        input_args = {"threads": threads} if threads else {}
+        if keyframes_only:
+            # let the decoder drop everything but key frames
+            input_args["skip_frame"] = "nokey"
+        if seek is not None:
+            input_args["ss"] = seek
+            input_args["t"] = window
+
+        source = ffmpeg.input(fname, **input_args)
+        stream = source.video
+        if scale_width:
+            stream = stream.filter("scale", scale_width, -2)
+        stream = stream.filter("blackdetect", d=black_min_duration, pix_th=black_pixel_tresh, pic_th=black_ratio_thresh)
+        if silence:
+            # audio rides along in the same decode pass
+            audio = source.audio.filter(
+                "silencedetect", n=f"{MediaProcessor.silence_noise_db}dB", d=MediaProcessor.silence_min_duration
+            )
+            filter_complex = ffmpeg.output(stream, audio, "pipe:", format="null")
+        else:
+            filter_complex = stream.output("pipe:", format="null")
+        if threads:
+            filter_complex = filter_complex.global_args("-filter_threads", str(threads))
+
+        # Actually run the command and capture its output
+        stdout, stderr = filter_complex.run(capture_stdout=True, capture_stderr=True)
+
+        black_frames = MediaProcessor._parse_detect_lines(
+            stderr, "blackdetect", ["black_start", "black_end", "black_duration"]
+        )
+        if seek:
+            # input seeking restarts timestamps at zero
+            for info in black_frames:
+                info["black_start"] += seek
+                info["black_end"] += seek
+        if silence:
+            return (black_frames, stderr)
+        return black_frames
+
+    @staticmethod
+    def _has_audio(fname) -> bool:
+        # a header only probe - no decoding
+        probed = ffmpeg.probe(fname, select_streams="a", show_entries="stream=codec_type")
+        return any(stream.get("codec_type", None) == "audio" for stream in probed.get("streams", []))
+
+    @staticmethod
+    def _run_black_silence(fname, base_duration, *args, **kwargs):
+        """One decode for both filters - returns (black_frames, silences), silences is None without audio"""
+        if not MediaProcessor._has_audio(fname):
+            logging.getLogger("MEDIA").info(f"No audio stream in {fname} - using black frames only")
+            return (MediaProcessor._run_blackdetect(fname, *args, **kwargs), None)
+        (black_frames, stderr) = MediaProcessor._run_blackdetect(fname, *args, silence=True, **kwargs)
+        return (black_frames, MediaProcessor._parse_silence_lines(stderr, base_duration))
+
+    @staticmethod
+    def _refine_black(fname, candidates, black_min_duration, black_pixel_tresh, black_ratio_thresh, threads, pad):
+        """Full resolution blackdetect over a few seconds around each coarse candidate to get exact times"""
+        refined = []
+        for candidate in candidates:
+            seek = max(0.0, candidate["black_start"] - pad)
+            window = (candidate["black_end"] + pad) - seek
+            found = MediaProcessor._run_blackdetect(
+                fname, black_min_duration, black_pixel_tresh, black_ratio_thresh, threads, seek=seek, window=window
+            )
+            if len(found):
+                # the interval closest to the candidate is the one the coarse pass saw
+                best = min(found, key=lambda f: abs(f["black_start"] - candidate["black_start"]))
+                if not any(abs(r["black_start"] - best["black_start"]) < 0.001 for r in refined):
+                    refined.append(best)
+        return refined
+
+    @staticmethod
+    def black_detect(
+        fname,
+        base_duration,
+        black_min_duration=0.1,
+        black_pixel_tresh=0.1,
+        black_ratio_thresh=0.95,
+        threads=None,
+        mode="full",
+    ):
+        """
+        Finds break points from black frames. mode "full" runs blackdetect on every full resolution
+        frame. "fast" downsamples before the filter and "keyframes" also only decodes key frames -
+        both then refine each candidate with a short full resolution pass around it.
+        """
+
         def min_segment(break_points):
             spx = sorted(break_points, key=lambda x: x["segment_duration"])
             return spx[0]["segment_duration"]
@@ -229,47 +638,49 @@ class MediaProcessor:
             return spx
 
         _l = logging.getLogger("MEDIA")
-        _l.info(f"Detecting black frames in {fname}")
+        _l.info(f"Detecting black frames in {fname} ({mode} mode)")
 
         try:
-            # Build the ffmpeg command with blackdetect filter
-            filter_complex = (
-                ffmpeg.input(fname)
-                .filter("blackdetect", d=black_min_duration, pix_th=black_pixel_tresh, pic_th=black_ratio_thresh)
-                .output("pipe:", format="null")
-            )
+            if mode == "full":
+                (black_frames, silences) = MediaProcessor._run_black_silence(
+                    fname, base_duration, black_min_duration, black_pixel_tresh, black_ratio_thresh, threads
+                )
+            elif mode in ("fast", "keyframes"):
+                keyframes_only = mode == "keyframes"
+                # with only key frames, a single black frame is a candidate - refinement checks the duration
+                (coarse, silences) = MediaProcessor._run_black_silence(
+                    fname,
+                    base_duration,
+                    0 if keyframes_only else black_min_duration,
+                    black_pixel_tresh,
+                    black_ratio_thresh,
+                    threads,
+                    scale_width=MediaProcessor.fast_black_width,
+                    keyframes_only=keyframes_only,
+                )
+                _l.info(f"Refining {len(coarse)} black candidates in {fname}")
+                black_frames = MediaProcessor._refine_black(
+                    fname,
+                    coarse,
+                    black_min_duration,
+                    black_pixel_tresh,
+                    black_ratio_thresh,
+                    threads,
+                    MediaProcessor.fast_black_refine_pad,
+                )
+            else:
+                raise ValueError(f"Unknown black detection mode: {mode}")
 
-            # Actually run the command and capture its output
-            stdout, stderr = filter_complex.run(capture_stdout=True, capture_stderr=True)
-
-            # Decode and parse
-            black_frames = []
-            for line in stderr.decode("utf-8").split("\n"):
-                if "blackdetect" in line:
-                    try:
-                        parts = line.split("]")[1].strip().split(" ")
-                        info = {}
-                        for part in parts:
-                            if ":" in part:
-                                key, value = part.split(":")
-                                info[key] = float(value)
-                        if info:
-                            if "black_start" not in info or "black_end" not in info or "black_duration" not in info:
-                                # then not a good line
-                                continue
-
-                            black_frames.append(info)
-
-                    except IndexError:
-                        _l.debug(f"Skipping malformed line: {line}")
-                        pass
-                    except ValueError:
-                        _l.info(f"Skipping invalid data in line: {line}")
-                        pass
-                    except Exception as e:
-                        _l.info(f"An unexpected error occurred while parsing line: {line}. Error: {e}")
             _l.info(f"Found {len(black_frames)} black segments in {fname}")
 
+            if silences is not None:
+                MediaProcessor.score_black_silence(black_frames, silences)
+                scored = [f for f in black_frames if f["score"] >= MediaProcessor.silence_min_score]
+                # a dark scene with sound is not a break - but keep everything if nothing is silent at all
+                if len(scored):
+                    _l.info(f"{len(scored)} of {len(black_frames)} black segments are also silent in {fname}")
+                    black_frames = scored
+
             trimmed = []
             # trim any near start and end times
             for point in black_frames:
@@ -278,7 +689,7 @@ class MediaProcessor:
 
             segmented = MediaProcessor.calc_black_segments(trimmed, base_duration)
 
-            while min_segment(segmented) < timings.MIN_1 and len(segmented) > 1:
+            while len(segmented) > 1 and min_segment(segmented) < timings.MIN_1:
                 segmented = remove_min(segmented)
                 segmented = MediaProcessor.calc_black_segments(segmented, base_duration)
 
@@ -0,0 +1,207 @@
+import logging
+import os
+import sqlite3
+
+from fs42.db_pool import DBPool
+
+
+class Migrations:
+    """
+    Numbered schema changes for the fluid database, tracked by PRAGMA user_version. ensure applies the
+    ones a database hasn't seen yet in a single transaction the first time the database is used in a
+    process, so the IO classes never run DDL themselves.
+
+    Databases from before versioning start at 0 and may already have some of these tables, columns or
+    indexes, so every step checks before it creates. Add new steps to the end of steps - never edit or
+    reorder ones that have shipped.
+    """
+
+    _l = logging.getLogger("MIGRATIONS")
+
+    @staticmethod
+    def _columns(cursor, table) -> list:
+        return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+    @staticmethod
+    def _has_table(cursor, table) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def _v1_tables(cursor):
+        cursor.execute("""CREATE TABLE IF NOT EXISTS file_meta (
+                            path TEXT PRIMARY KEY,
+                            duration REAL,
+                            size INTEGER,
+                            first_added TIMESTAMP,
+                            last_mod TIMESTAMP,
+                            last_checked TIMESTAMP,
+                            last_updated TIMESTAMP,
+                            meta TEXT
+                            )""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS break_points (
+                            path TEXT REFERENCES file_meta(path) PRIMARY KEY,
+                            points TEXT,
+                            last_updated TIMESTAMP
+                            )""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_entries (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            path TEXT NOT NULL,
+                            title TEXT NOT NULL,
+                            duration REAL NOT NULL,
+                            tag TEXT NOT NULL,
+                            count INTEGER DEFAULT 0,
+                            hints TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            UNIQUE(station, tag, path)
+                            )""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_catalog_station ON catalog_entries(station)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_catalog_tag ON catalog_entries(tag)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_catalog_path ON catalog_entries(path)")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag_duration_count
+                        ON catalog_entries(station, tag, duration, count)""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS liquid_blocks (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            liquid_type TEXT NOT NULL,
+                            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            end_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            break_strategy TEXT NOT NULL,
+                            title TEXT NOT NULL,
+                            sequence_key TEXT,
+                            break_info TEXT,
+                            content_json TEXT NOT NULL,
+                            plan_json TEXT NOT NULL
+                            )""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS named_sequence (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            sequence_name TEXT NOT NULL,
+                            tag_path TEXT NOT NULL,
+                            start_perc REAL NOT NULL,
+                            end_perc REAL NOT NULL,
+                            current_index INTEGER NOT NULL,
+                            UNIQUE(station, sequence_name, tag_path)
+                            )""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS sequence_entries (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            fpath TEXT NOT NULL,
+                            sequence_index INTEGER NOT NULL,
+                            named_sequence_id INTEGER NOT NULL,
+                            FOREIGN KEY(named_sequence_id) REFERENCES named_sequence(id)
+                            )""")
+
+    @staticmethod
+    def _realpath(path):
+        try:
+            return os.path.realpath(path)
+        except (ValueError, OSError):
+            return None
+
+    @staticmethod
+    def _v2_catalog_realpath(cursor):
+        if "realpath" not in Migrations._columns(cursor, "catalog_entries"):
+            cursor.execute("ALTER TABLE catalog_entries ADD COLUMN realpath TEXT")
+        # one statement for the whole backfill, os.path.realpath is called from SQL
+        cursor.connection.create_function("fs42_realpath", 1, Migrations._realpath, deterministic=True)
+        cursor.execute("UPDATE catalog_entries SET realpath = fs42_realpath(path) WHERE realpath IS NULL")
+        Migrations._l.info(f"Filled in realpath for {cursor.rowcount} catalog entries")
+
+    @staticmethod
+    def _v3_file_fingerprint(cursor):
+        if "fingerprint" not in Migrations._columns(cursor, "file_meta"):
+            cursor.execute("ALTER TABLE file_meta ADD COLUMN fingerprint TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS file_meta_fingerprint ON file_meta(fingerprint)")
+
+    @staticmethod
+    def _create_fts(cursor, table, source, columns) -> bool:
+        """FTS5 table over source keyed by its id and kept in step by triggers - False without FTS5"""
+        if Migrations._has_table(cursor, table):
+            return True
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, prefix = '2 3')")
+        except sqlite3.OperationalError as e:
+            Migrations._l.warning(f"Full text search is not available, {source} search will be slower: {e}")
+            return False
+
+        names = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON {source}
+                        BEGIN
+                            INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
+                        END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON {source}
+                        BEGIN
+                            DELETE FROM {table} WHERE rowid = old.id;
+                        END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {names} ON {source}
+                        BEGIN
+                            DELETE FROM {table} WHERE rowid = old.id;
+                            INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
+                        END""")
+        cursor.execute(f"INSERT INTO {table}(rowid, {names}) SELECT id, {names} FROM {source}")
+        return True
+
+    @staticmethod
+    def _v4_search_indexes(cursor):
+        Migrations._create_fts(cursor, "catalog_entries_fts", "catalog_entries", ["title", "tag", "path"])
+        Migrations._create_fts(cursor, "liquid_blocks_fts", "liquid_blocks", ["title"])
+
+    @staticmethod
+    def _v5_catalog_station_path(cursor):
+        # without it updates by (station, path) walk every row of the station through the unique index
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_catalog_station_path ON catalog_entries(station, path)")
+
+    @staticmethod
+    def _v6_catalog_tag_count_duration(cursor):
+        # the sql catalog backend reads candidates one play count at a time, shortest first
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag_count_duration
+                        ON catalog_entries(station, tag, count, duration)""")
+
+    # user_version after each step is its position in this list, counting from 1
+    steps = [
+        _v1_tables,
+        _v2_catalog_realpath,
+        _v3_file_fingerprint,
+        _v4_search_indexes,
+        _v5_catalog_station_path,
+        _v6_catalog_tag_count_duration,
+    ]
+
+    @staticmethod
+    def migrate(connection: sqlite3.Connection) -> int:
+        """Applies the steps this database hasn't had yet in one transaction, returns the new user_version"""
+        latest = len(Migrations.steps)
+        if connection.in_transaction:
+            connection.commit()
+        # take the write lock before reading the version so two processes can't both migrate
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.cursor()
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version > latest:
+                Migrations._l.warning(f"Database is at schema {version}, newer than this code ({latest})")
+            for number in range(version + 1, latest + 1):
+                Migrations._l.info(f"Migrating database to schema {number}")
+                Migrations.steps[number - 1](cursor)
+            if version < latest:
+                cursor.execute(f"PRAGMA user_version = {latest}")
+            cursor.close()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return max(version, latest)
+
+    @staticmethod
+    def _migrate_and_list(connection) -> set:
+        Migrations.migrate(connection)
+        rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return {name for (name,) in rows}
+
+    @staticmethod
+    def ensure(db_path) -> set:
+        """Migrates db_path once per process, returns the names of its tables"""
+        return DBPool.init_once(db_path, "migrations", Migrations._migrate_and_list)
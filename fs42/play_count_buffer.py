@@ -0,0 +1,39 @@
+import logging
+
+from fs42.catalog_api import CatalogAPI
+
+
+class PlayCountBuffer:
+    """
+    Write-behind play counts for one station. Every pick is recorded in memory, and flush writes the
+    totals as count = count + n in one transaction, so rotation survives a catalog reload without a
+    database write per pick.
+    """
+
+    # a checkpoint flush happens once this many picks are waiting
+    checkpoint_picks = 5000
+
+    def __init__(self, station_config):
+        self.station_config = station_config
+        self._l = logging.getLogger(f"{station_config['network_name']} - COUNTS")
+        self._pending = {}
+        self._picks = 0
+
+    def __len__(self):
+        return self._picks
+
+    def record(self, entry, plays=1):
+        self._pending[entry.path] = self._pending.get(entry.path, 0) + plays
+        self._picks += plays
+        if self._picks >= PlayCountBuffer.checkpoint_picks:
+            self.flush()
+
+    def flush(self) -> int:
+        if not len(self._pending):
+            return 0
+        CatalogAPI.add_play_counts(self.station_config, self._pending)
+        self._l.debug(f"Saved {self._picks} plays across {len(self._pending)} catalog entries")
+        written = len(self._pending)
+        self._pending = {}
+        self._picks = 0
+        return written
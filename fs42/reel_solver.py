@@ -0,0 +1,126 @@
+import logging
+import math
+import time
+
+from fs42.catalog_entry import CatalogEntry, MatchingContentNotFound
+from fs42.liquid_blocks import ReelBlock
+
+
+class ReelSolver:
+    """
+    Fills a break with a subset-sum over tenths of a second instead of the greedy pick-until-full loop.
+
+    Each break gets its bumpers first, then the commercials (or bumps on commercial free stations) are
+    chosen from the least played entries that fit, so hints and rotation still apply. Durations are
+    rounded up to the resolution, so a solution never runs over; the last break takes whatever the
+    earlier ones left and may also use plain bumps to close the gap. Anything still uncovered goes to
+    the be right back media like the greedy fill.
+    """
+
+    # least played entries offered to the solver for each break
+    pool_size = 60
+    # seconds short of the target that count as a perfect fill, and the step durations are rounded up to
+    tolerance = 0.5
+    resolution = 0.1
+    # seconds the subset search may spend on one break before keeping the best fill so far
+    time_budget = 0.05
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._l = logging.getLogger(f"{catalog.config['network_name']} - REELS")
+
+    def fill(self, when, length, use_bumpers=True, commercial_dir=None, bump_dir=None, strict_count=None):
+        config = self.catalog.config
+        if strict_count:
+            break_count = strict_count
+        else:
+            break_count = max(1, round(length / config["break_duration"]))
+
+        bump_tag = bump_dir if bump_dir else config["bump_dir"]
+        if config["commercial_free"]:
+            fill_tag = bump_tag
+        else:
+            fill_tag = commercial_dir if commercial_dir else config["commercial_dir"]
+
+        blocks = []
+        remaining = length
+        for i in range(break_count):
+            target = remaining / (break_count - i)
+            (start_bump, end_bump) = self._bumpers(when, target, bump_tag) if use_bumpers else (None, None)
+            if start_bump:
+                target -= start_bump.duration + end_bump.duration
+            # the last break has nothing after it to soak up a short fill, so let plain bumps plug the gap
+            tags = [fill_tag] if i < break_count - 1 or fill_tag == bump_tag else [fill_tag, bump_tag]
+            comms = self._solve(tags, when, target)
+            block = ReelBlock(start_bump, comms, end_bump)
+            remaining -= block.duration
+            blocks.append(block)
+
+        if remaining > self.catalog.min_gap and "be_right_back_media" in config:
+            brb = CatalogEntry(config["be_right_back_media"], duration=remaining, tag="brb")
+            blocks.append(ReelBlock(None, [brb], None))
+
+        return blocks
+
+    def _bumpers(self, when, target, bump_tag):
+        try:
+            start_bump = self.catalog.find_bump(target, when, self.catalog.prebump, bump_tag=bump_tag)
+            end_bump = None
+            if start_bump:
+                # the end bump only gets what the start bump left, so the pair never runs past the break
+                end_bump = self.catalog.find_bump(
+                    target - start_bump.duration, when, self.catalog.postbump, bump_tag=bump_tag
+                )
+        except MatchingContentNotFound:
+            end_bump = None
+        if not end_bump:
+            self._l.debug(f"No pair of bumpers fits a {target:.1f} second break")
+            return (None, None)
+        return (start_bump, end_bump)
+
+    def _solve(self, tags, when, target) -> list[CatalogEntry]:
+        if target < 1:
+            return []
+
+        # earlier tags come first in the pool, so the solver only reaches for later ones when it has to
+        pool = []
+        for tag in tags:
+            if tag in self.catalog.clip_index and len(self.catalog.clip_index[tag]):
+                index = self.catalog._tag_index(tag)
+                pool += [(tag, entry) for entry in index.eligible(target, when, ReelSolver.pool_size)]
+
+        weights = [math.ceil(entry.duration / ReelSolver.resolution) for (_tag, entry) in pool]
+        chosen = [pool[i] for i in ReelSolver.subset_sum(weights, math.floor(target / ReelSolver.resolution))]
+        for tag, entry in chosen:
+            self.catalog._record_pick(tag, entry)
+        return [entry for (_tag, entry) in chosen]
+
+    @staticmethod
+    def subset_sum(weights, budget, tolerance=None, time_budget=None) -> list[int]:
+        """Indexes of weights with the largest sum <= budget - earlier weights are preferred
+
+        Reachable sums are kept as bits of an int, so adding a weight is one shift and or.
+        """
+        tolerance = round(ReelSolver.tolerance / ReelSolver.resolution) if tolerance is None else tolerance
+        time_budget = ReelSolver.time_budget if time_budget is None else time_budget
+        deadline = time.monotonic() + time_budget
+        limit = (1 << (budget + 1)) - 1
+
+        # reachable[k] holds the sums reachable with the first k weights
+        reachable = [1]
+        for weight in weights:
+            reachable.append((reachable[-1] | (reachable[-1] << weight)) & limit)
+            if budget - (reachable[-1].bit_length() - 1) <= tolerance or time.monotonic() > deadline:
+                break
+
+        # walk back from the best sum, leaving out the later weights whenever the sum is reachable without them
+        best = reachable[-1].bit_length() - 1
+        picked = []
+        for k in range(len(reachable) - 1, 0, -1):
+            if best == 0:
+                break
+            if not (reachable[k - 1] >> best) & 1:
+                best -= weights[k - 1]
+                picked.append(k - 1)
+        picked.reverse()
+        return picked
@@ -0,0 +1,16 @@
+import re
+
+
+class SearchQuery:
+    """Turns search box text into an FTS5 match expression"""
+
+    @staticmethod
+    def to_match(text: str) -> str:
+        """
+        Every word becomes a quoted prefix term and all of them must match, so "star tre" finds
+        "Star Trek" - quoting keeps FTS5 operators and punctuation in the text from being parsed.
+        Returns an empty string when there is nothing to search for.
+        """
+        if not text:
+            return ""
+        return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
@@ -0,0 +1,111 @@
+import logging
+import os
+
+from fs42.catalog_entry import CatalogEntry
+from fs42.media_processor import MediaProcessor
+
+
+class SharedScan:
+    """
+    Walk and probe results shared by every station in one catalog build. Stations often point at the
+    same show, commercial and bump folders - each distinct directory (by realpath) is walked once and
+    each distinct file probed once, then fanned back out as new CatalogEntry objects that use each
+    station's own paths and tags.
+    """
+
+    def __init__(self):
+        self._l = logging.getLogger("SCAN")
+        # real dir -> [(path relative to the dir, realpath, size, mtime)] from one recursive walk
+        self._walks = {}
+        # real dir -> sub folder names
+        self._subs = {}
+        # file realpath -> duration, None when the probe failed
+        self._durations = {}
+        self._cache_dirs = set()
+        self.walks_requested = 0
+        self.probes_requested = 0
+
+    def _walk(self, path) -> list[tuple]:
+        """The files below path from a walk that covers it - path itself is only walked when none does"""
+        real_dir = os.path.realpath(path)
+        for walked_dir, files in self._walks.items():
+            if real_dir == walked_dir:
+                return files
+            if real_dir.startswith(walked_dir + "/"):
+                prefix = real_dir[len(walked_dir) + 1 :]
+                # the walker skips hidden folders, so those still need a walk of their own
+                if any(part.startswith(".") for part in prefix.split("/")):
+                    continue
+                prefix += "/"
+                return [(rel[len(prefix) :], rp, sz, mt) for (rel, rp, sz, mt) in files if rel.startswith(prefix)]
+
+        files = [(fpath[len(path) + 1 :], rp, sz, mt) for (fpath, rp, sz, mt) in MediaProcessor.walk_media(path)]
+        self._walks[real_dir] = files
+        return files
+
+    def scan_file_cache(self, fluid, content_dir):
+        self.walks_requested += 1
+        real_dir = os.path.realpath(content_dir)
+        # a scan of a parent folder already covers this one
+        if any(real_dir == d or real_dir.startswith(d + "/") for d in self._cache_dirs):
+            self._l.info(f"File cache for {content_dir} is already up to date")
+            return
+        # the same walk later answers find_media for every folder below content_dir
+        walked = [(f"{content_dir}/{rel}", rp, sz, mt) for (rel, rp, sz, mt) in self._walk(content_dir)]
+        fluid.scan_file_cache(content_dir, walked)
+        self._cache_dirs.add(real_dir)
+
+    def find_media(self, path, recursive=False) -> list[str]:
+        self.walks_requested += 1
+        return [f"{path}/{rel}" for (rel, _rp, _sz, _mt) in self._walk(path) if recursive or "/" not in rel]
+
+    def process_media(self, file_list, tag, hints=[], fluid=None) -> list[CatalogEntry]:
+        return self.process_jobs([(fname, hints) for fname in file_list], tag, fluid)
+
+    def process_subs(self, dir_path, tag, bumpdir=False, fluid=None) -> list[CatalogEntry]:
+        real_dir = os.path.realpath(dir_path)
+        if real_dir not in self._subs:
+            try:
+                self._subs[real_dir] = [f.name for f in os.scandir(dir_path) if f.is_dir()]
+            except OSError:
+                self._subs[real_dir] = []
+        jobs = []
+        for name in self._subs[real_dir]:
+            sub = f"{dir_path}/{name}"
+            hints = MediaProcessor._process_hints(sub, tag, bumpdir)
+            jobs += [(fname, hints) for fname in self.find_media(sub, True)]
+        return self.process_jobs(jobs, tag, fluid)
+
+    def process_jobs(self, jobs, tag, fluid=None) -> list[CatalogEntry]:
+        """Same as MediaProcessor._process_jobs, but only files no station has probed yet are probed"""
+        self.probes_requested += len(jobs)
+        keyed = [(fname, hints, os.path.realpath(fname)) for (fname, hints) in jobs]
+
+        pending = {}
+        for fname, hints, real in keyed:
+            if real not in self._durations and real not in pending:
+                pending[real] = (fname, hints)
+        if len(pending):
+            probed = MediaProcessor._process_jobs(list(pending.values()), tag, fluid)
+            # failures are dropped from the results, so match them back up by realpath
+            found = {os.path.realpath(entry.path): entry.duration for entry in probed}
+            for real in pending:
+                self._durations[real] = found.get(real, None)
+
+        results = []
+        for fname, hints, real in keyed:
+            duration = self._durations[real]
+            if duration:
+                entry = CatalogEntry(fname, duration, tag, hints)
+                entry.realpath = real if fluid else False
+                results.append(entry)
+        return results
+
+    def report(self) -> str:
+        walks = len(self._walks)
+        probes = len(self._durations)
+        ratio = self.probes_requested / probes if probes else 1.0
+        return (
+            f"Shared scan walked {walks} of {self.walks_requested} folders and probed {probes} of "
+            f"{self.probes_requested} files ({ratio:.1f}x dedup)"
+        )
@@ -0,0 +1,204 @@
+import logging
+import random
+import sqlite3
+from collections import OrderedDict
+
+from fs42.catalog_entry import CatalogEntry
+from fs42.catalog_io import CatalogIO
+from fs42.db_pool import DBPool
+from fs42.hint_mask import HintMask
+from fs42.media_processor import MediaProcessor
+from fs42.play_count_buffer import PlayCountBuffer
+
+
+class SqlCatalog:
+    """
+    The "sql" catalog backend - answers candidate, tag and path lookups for one station with indexed
+    queries instead of loading the whole catalog. Rows come back through a small LRU of entries so
+    repeated picks share one object, and hints are parsed and compiled once per distinct hints string.
+
+    Play counts are kept in a PlayCountBuffer like the in-memory backend, and the plays not yet written
+    are laid over the counts the queries read, so later picks see them straight away. commit writes
+    them in one short transaction, and the buffer does the same every PlayCountBuffer.checkpoint_picks
+    picks, so a build never holds the write lock between picks.
+    """
+
+    # catalog entries kept in memory
+    cache_size = 1024
+
+    def __init__(self, station_config):
+        self.station_config = station_config
+        self.station = station_config["network_name"]
+        self._l = logging.getLogger(f"{self.station} - SQLCAT")
+        # makes sure the table and its indexes are in place
+        self.db_path = CatalogIO().db_path
+        # dbid -> CatalogEntry, least recently used first
+        self._entries = OrderedDict()
+        # hints column -> (hints, compiled mask)
+        self._hints = {}
+        self.play_counts = PlayCountBuffer(station_config)
+        # dbid -> plays recorded in play_counts but not yet in the database
+        self._plays = {}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # only reads go through it - play counts are written by CatalogIO
+        return DBPool.connect(self.db_path, readonly=True)
+
+    def tag_sizes(self) -> dict:
+        cursor = self.connection.execute(
+            "SELECT tag, COUNT(*) FROM catalog_entries WHERE station = ? GROUP BY tag", (self.station,)
+        )
+        return {tag: size for (tag, size) in cursor.fetchall()}
+
+    def _compiled_hints(self, hints_str):
+        if hints_str not in self._hints:
+            hints = CatalogEntry.from_db_row((None, None, "", "", 0, None, 0, hints_str, None, None)).hints
+            self._hints[hints_str] = (hints, HintMask.compile(hints))
+        return self._hints[hints_str]
+
+    def _entry(self, row) -> CatalogEntry:
+        dbid = row[0]
+        entry = self._entries.get(dbid, None)
+        if entry is None:
+            entry = CatalogEntry.from_db_row(row)
+            entry.hints = self._compiled_hints(row[7])[0]
+            self._entries[dbid] = entry
+            if len(self._entries) > SqlCatalog.cache_size:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(dbid)
+            entry.count = row[6] + self._plays.get(dbid, 0)
+        return entry
+
+    def iterate_tag(self, tag):
+        cursor = self.connection.execute(
+            "SELECT * FROM catalog_entries WHERE station = ? AND tag = ? ORDER BY title", (self.station, tag)
+        )
+        for row in cursor:
+            yield self._entry(row)
+
+    def by_id(self, dbid):
+        entry = self._entries.get(dbid, None)
+        if entry is not None:
+            self._entries.move_to_end(dbid)
+            return entry
+        row = self.connection.execute("SELECT * FROM catalog_entries WHERE id = ?", (dbid,)).fetchone()
+        return self._entry(row) if row else None
+
+    def by_path(self, path):
+        cursor = self.connection.execute(
+            "SELECT * FROM catalog_entries WHERE station = ? AND path = ?", (self.station, path)
+        )
+        row = cursor.fetchone()
+        return self._entry(row) if row else None
+
+    def tiers(self, tag, seconds, when):
+        """Yields the ids shorter than seconds whose hints allow when, one list per play count from the lowest"""
+        (hour, day, midnight) = (when.hour, HintMask.day_index(when), HintMask.is_midnight(when))
+        # unsaved plays move an entry to a later tier than its database count - hold it until then
+        deferred = {}
+        tier_count = self._next_count(tag, seconds, None)
+        while tier_count is not None:
+            for count in sorted(deferred.keys()):
+                if count >= tier_count:
+                    break
+                yield deferred.pop(count)
+
+            # one play count at a time is a range on idx_catalog_tag_count_duration - hints are only
+            # read for this tier, whole rows only for the entries that get picked
+            cursor = self.connection.execute(
+                """SELECT id, hints FROM catalog_entries
+                   WHERE station = ? AND tag = ? AND count = ? AND duration >= 1 AND duration < ?""",
+                (self.station, tag, tier_count, seconds),
+            )
+            tier = []
+            for dbid, hints_str in cursor:
+                (hints, mask) = self._compiled_hints(hints_str)
+                if mask is not None:
+                    if not mask.allows_at(hour, day, midnight):
+                        continue
+                elif not MediaProcessor._test_candidate_hints(hints, when):
+                    continue
+                plays = self._plays.get(dbid, 0)
+                if plays:
+                    deferred.setdefault(tier_count + plays, []).append(dbid)
+                else:
+                    tier.append(dbid)
+            tier += deferred.pop(tier_count, [])
+            if len(tier):
+                yield tier
+            tier_count = self._next_count(tag, seconds, tier_count)
+
+        for count in sorted(deferred.keys()):
+            yield deferred.pop(count)
+
+    def _next_count(self, tag, seconds, after):
+        """The lowest play count above after with an entry shorter than seconds - None when there are no more"""
+        # walks idx_catalog_tag_count_duration in count order and stops at the first entry that fits
+        row = self.connection.execute(
+            """SELECT count FROM catalog_entries
+               WHERE station = ? AND tag = ? AND count > ? AND duration >= 1 AND duration < ?
+               ORDER BY count LIMIT 1""",
+            (self.station, tag, -1 if after is None else after, seconds),
+        ).fetchone()
+        return row[0] if row else None
+
+    def increment(self, entry, by=1):
+        self._plays[entry.dbid] = self._plays.get(entry.dbid, 0) + by
+        entry.count += by
+        self.play_counts.record(entry, by)
+        if not len(self.play_counts):
+            # the buffer hit its checkpoint and wrote every play to the database
+            self._plays = {}
+
+    def commit(self):
+        self.play_counts.flush()
+        self._plays = {}
+
+
+class SqlTagView:
+    """Stands in for a clip_index tag list - length comes from the row count and iterating streams the rows"""
+
+    def __init__(self, backend: SqlCatalog, tag, size):
+        self.backend = backend
+        self.tag = tag
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.backend.iterate_tag(self.tag)
+
+
+class SqlCandidateIndex:
+    """CandidateIndex lookups answered by SqlCatalog, one tier of rows at a time"""
+
+    def __init__(self, view: SqlTagView):
+        self.source = view
+        self.backend = view.backend
+        self.tag = view.tag
+
+    def is_current(self, entries) -> bool:
+        return entries is self.source
+
+    def pick_lowest(self, seconds, when):
+        """The least played entry shorter than seconds whose hints allow when - random among ties"""
+        for tier in self.backend.tiers(self.tag, seconds, when):
+            return self.backend.by_id(random.choice(tier))
+        return None
+
+    def eligible(self, seconds, when, limit):
+        """Up to limit entries shorter than seconds whose hints allow when - least played first, shuffled among ties"""
+        found = []
+        for tier in self.backend.tiers(self.tag, seconds, when):
+            random.shuffle(tier)
+            found += tier[: limit - len(found)]
+            if len(found) >= limit:
+                break
+        return [self.backend.by_id(dbid) for dbid in found]
+
+    def increment(self, entry, by=1):
+        """Bumps the play count of entry (buffered until the backend commits) and on the entry"""
+        self.backend.increment(entry, by)
@@ -20,6 +20,8 @@ class StationManager(object):
         "commercial_free": False,
         "clip_shows": [],
         "break_duration": 120,
+        "reel_fill": "greedy",
+        "catalog_backend": "memory",
         "hidden": False,
     }
 
@@ -59,6 +61,10 @@ class StationManager(object):
                     "start_mpv": True,
                     "server_host": "0.0.0.0",
                     "server_port": 4242,
+                    "probe_workers": None,
+                    "break_workers": None,
+                    "break_threads": None,
+                    "break_detect_mode": "full",
                 }
                 self._number_index = {}
                 self._name_index = {}
@@ -120,6 +126,10 @@ class StationManager(object):
                         "db_path",
                         "server_host",
                         "server_port",
+                        "probe_workers",
+                        "break_workers",
+                        "break_threads",
+                        "break_detect_mode",
                     ]
                     d = json.load(f)
 
@@ -1,9 +1,12 @@
 import re
+from functools import lru_cache
 from pathlib import Path
 
 
 class TitleParser:
+    # every block of a schedule is parsed on load, and most share a handful of titles
     @staticmethod
+    @lru_cache(maxsize=4096)
     def parse_title(in_str: str) -> str:
         if not in_str:
             return ""  # Consider defaulting to No Information or No Data to match TV Guides
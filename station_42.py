@@ -5,6 +5,7 @@ import datetime
 from rich.console import Console
 from rich.logging import RichHandler
 from rich.panel import Panel
+from rich.progress import Progress, MofNCompleteColumn
 from rich import style
 
 from fs42.catalog import ShowCatalog
@@ -12,6 +13,7 @@ from fs42.station_manager import StationManager
 from fs42.liquid_manager import LiquidManager
 from fs42.liquid_schedule import LiquidSchedule
 from fs42.fluid_builder import FluidBuilder
+from fs42.shared_scan import SharedScan
 from fs42.sequence_api import SequenceAPI
 from fs42.fs42_server.fs42_server import mount_fs42_api
 
@@ -21,12 +23,16 @@ logging.basicConfig(format="[%(name)s] %(message)s", level=logging.INFO, handler
 
 
 class Station42:
-    def __init__(self, config, rebuild_catalog=False, force=False):
+    def __init__(self, config, rebuild_catalog=False, force=False, incremental=False, shared_scan=None):
         # station configuration
         self.config = config
         self._l = logging.getLogger(self.config["network_name"])
         self.catalog: ShowCatalog = ShowCatalog(
-            self.config, rebuild_catalog=rebuild_catalog, force=force
+            self.config,
+            rebuild_catalog=rebuild_catalog,
+            force=force,
+            incremental=incremental,
+            shared_scan=shared_scan,
         )
         self.get_text_listing = self.catalog.get_text_listing
         self.check_catalog = self.catalog.check_catalog
@@ -80,6 +86,12 @@ def build_parser():
         nargs="*",
         help="Rebuild catalog for the specified network names or all networks if no parameter given",
     )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="With -r only apply changed, added and removed files to the catalogs - keeps catalog ids, play counts and existing schedules",
+    )
     parser.add_argument(
         "-q",
         "--rebuild_sequences",
@@ -97,6 +109,31 @@ def build_parser():
         "--break_detect_dir",
         help="Scan for points break insertion point in media files in the provided directory. (VERY experimental)",
     )
+    parser.add_argument(
+        "--break_workers",
+        type=int,
+        help="With -b, the number of files to scan for breaks at the same time (default: half the cores)",
+    )
+    parser.add_argument(
+        "--break_threads",
+        type=int,
+        help="With -b, the number of threads each ffmpeg break scan may use (default: cores / workers)",
+    )
+    parser.add_argument(
+        "--break_mode",
+        choices=["full", "fast", "keyframes"],
+        help="With -b, full decodes every frame, fast scans downsampled frames and keyframes also skips non-key frames - both fast modes refine each break at full resolution",
+    )
+    parser.add_argument(
+        "--duplicates",
+        action="store_true",
+        help="Print groups of files in the fluid file cache that have the same content.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and apply new, changed and removed content files to the catalogs as they happen.",
+    )
     parser.add_argument(
         "-w",
         "--add_week",
@@ -200,14 +237,14 @@ def main():
                         f"Failed to reset schedule for {station['network_name']} - check logs."
                     )
 
-    def rebuild_catalogs(_rebuild_list):
+    def rebuild_catalogs(_rebuild_list, shared_scan=None):
         nonlocal success_messages, failure_messages, _l
         _l.info("Starting catalog rebuild.")
         for station in _rebuild_list:
             if station["_has_catalog"]:
                 _l.info(f"Rebuilding catalog for {station['network_name']}")
                 try:
-                    Station42(station, True, args.force)
+                    Station42(station, True, args.force, args.incremental, shared_scan)
                     success_messages.append(
                         f"Successfully rebuilt catalog for {station['network_name']}"
                     )
@@ -375,8 +412,17 @@ def main():
             failure_messages.append(
                 "Failed to get list of stations to rebuild - check your arguments."
             )
-        delete_schedules(_rebuild_list)
-        rebuild_catalogs(_rebuild_list)
+        if args.incremental:
+            _l.info("Incremental rebuild - keeping existing schedules.")
+        else:
+            delete_schedules(_rebuild_list)
+        if len(args.rebuild_catalog) == 0:
+            # every station is being rebuilt, so walk and probe shared folders only once
+            shared_scan = SharedScan()
+            rebuild_catalogs(_rebuild_list, shared_scan)
+            _l.info(shared_scan.report())
+        else:
+            rebuild_catalogs(_rebuild_list)
 
         if FF_USE_FLUID_FILE_CACHE:
             try:
@@ -446,9 +492,29 @@ def main():
 
     if args.break_detect_dir is not None:
         _l.info("Scanning for break detection points in media files...")
-        FluidBuilder().scan_breaks(args.break_detect_dir)
+        with Progress(*Progress.get_default_columns(), MofNCompleteColumn(), console=console) as progress:
+            task = progress.add_task("Detecting breaks", total=None)
+
+            def on_break_progress(completed, total, path):
+                progress.update(task, completed=completed, total=total)
+
+            FluidBuilder().scan_breaks(
+                args.break_detect_dir,
+                args.break_workers,
+                args.break_threads,
+                progress=on_break_progress,
+                mode=args.break_mode,
+            )
         success_messages.append("I scanned for break detection points")
 
+    if args.duplicates:
+        groups = FluidBuilder().find_duplicates()
+        for group in groups:
+            console.print(f"[yellow]{len(group)} copies:[/yellow]")
+            for path in group:
+                console.print(f"    {path}")
+        success_messages.append(f"I found {len(groups)} files with duplicate content in the file cache")
+
     if args.add_day is not None:
         _to_add_to = []
         try:
@@ -538,6 +604,16 @@ def main():
 
     print_outcome(success_messages, failure_messages, console)
 
+    if args.watch:
+        from fs42.catalog_watcher import CatalogWatcher
+
+        _l.info("Watching content folders for changes - press ctrl-c to stop.")
+        try:
+            CatalogWatcher(StationManager().stations).run()
+        except KeyboardInterrupt:
+            _l.info("Stopped watching content folders.")
+        return
+
     if args.server or len(sys.argv) <= 1:
         info = "\nFS42 web server is running on this machine. You can log into the web gui at http://localhost:4242 to manage catalogs and schedules\n"
         print()
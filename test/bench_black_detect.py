@@ -0,0 +1,71 @@
+# Compares the fast black detection modes against the full decode.
+# Not collected by pytest - needs ffmpeg and real media:
+#   python test/bench_black_detect.py catalog/some_show/*.mp4
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from fs42.media_processor import MediaProcessor
+
+
+def match_breaks(reference, candidate, tolerance):
+    # pair every reference break with the closest candidate start inside tolerance
+    matched = 0
+    errors = []
+    for ref in reference:
+        closest = min(candidate, key=lambda c: abs(c["black_start"] - ref["black_start"]), default=None)
+        if closest is not None and abs(closest["black_start"] - ref["black_start"]) <= tolerance:
+            matched += 1
+            errors.append(abs(closest["black_start"] - ref["black_start"]))
+    return (matched, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark black detection modes")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--modes", nargs="*", default=["fast", "keyframes"])
+    parser.add_argument("--tolerance", type=float, default=0.5, help="seconds a break start may be off by")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    totals = {mode: {"time": 0.0, "found": 0, "matched": 0, "errors": []} for mode in ["full"] + args.modes}
+    reference_count = 0
+
+    for fname in args.files:
+        duration = MediaProcessor._get_duration(fname)
+        started = time.perf_counter()
+        reference = MediaProcessor.black_detect(fname, duration, threads=args.threads, mode="full") or []
+        totals["full"]["time"] += time.perf_counter() - started
+        totals["full"]["found"] += len(reference)
+        reference_count += len(reference)
+
+        for mode in args.modes:
+            started = time.perf_counter()
+            found = MediaProcessor.black_detect(fname, duration, threads=args.threads, mode=mode) or []
+            totals[mode]["time"] += time.perf_counter() - started
+            totals[mode]["found"] += len(found)
+            (matched, errors) = match_breaks(reference, found, args.tolerance)
+            totals[mode]["matched"] += matched
+            totals[mode]["errors"] += errors
+
+    print(f"{'mode':<10} | {'seconds':>9} | {'speedup':>7} | {'breaks':>6} | {'recall':>6} | {'mean err':>8}")
+    full_time = totals["full"]["time"]
+    for mode, total in totals.items():
+        speedup = full_time / total["time"] if total["time"] else 0
+        if mode == "full":
+            recall = 1.0
+            mean_err = 0.0
+        else:
+            recall = total["matched"] / reference_count if reference_count else 1.0
+            mean_err = sum(total["errors"]) / len(total["errors"]) if total["errors"] else 0.0
+        print(
+            f"{mode:<10} | {total['time']:>9.1f} | {speedup:>6.1f}x | {total['found']:>6} | "
+            f"{recall:>6.2f} | {mean_err:>7.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Rows per second for the bulk writes, row-by-row execute loops against chunked executemany.
+# Not collected by pytest - run it directly:
+#   python test/bench_bulk_writes.py --rows 100000
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from fs42.block_plan import BlockPlanEntry
+from fs42.catalog_entry import CatalogEntry
+from fs42.catalog_io import CatalogIO
+from fs42.db_pool import DBPool
+from fs42.liquid_blocks import LiquidBlock
+from fs42.liquid_io import LiquidIO
+from fs42.migrations import Migrations
+from fs42.schedule_hint import DayPartHint, MonthHint
+from fs42.sequence import NamedSequence
+from fs42.sequence_io import SequenceIO
+from fs42.station_manager import StationManager
+
+
+def make_entries(rows):
+    # a folder's entries share one hints list, the way the catalog builds them
+    folder_hints = [[], [DayPartHint("morning")], [MonthHint("December"), DayPartHint("prime")]]
+    return [
+        CatalogEntry(f"catalog/show{i // 100}/episode {i}.mp4", 1320.0, f"show{i // 100}", folder_hints[(i // 100) % 3])
+        for i in range(rows)
+    ]
+
+
+def make_blocks(rows, entries):
+    start = datetime.datetime(2024, 1, 1)
+    blocks = []
+    for i in range(rows):
+        entry = entries[i % len(entries)]
+        entry.dbid = i + 1
+        block = LiquidBlock(entry, start, start + datetime.timedelta(minutes=30))
+        block.plan = [BlockPlanEntry(entry.path, 0, 600), BlockPlanEntry("commercials/ad.mp4", 0, 120)]
+        blocks.append(block)
+        start += datetime.timedelta(minutes=30)
+    return blocks
+
+
+# the row by row writes these replaced
+
+
+def old_hints_json(entry):
+    hints = []
+    for hint in entry.hints:
+        hints.append(json.dumps(hint.toJSON()) if entry.hints else None)
+    return json.dumps(hints) if hints else None
+
+
+def old_put_catalog_entries(db_path, station, entries):
+    with DBPool.connect(db_path) as connection:
+        cursor = connection.cursor()
+        for entry in entries:
+            cursor.execute(
+                """INSERT OR REPLACE INTO catalog_entries
+                   (station, path, realpath, title, duration, tag, count, hints, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                (station, entry.path, entry.realpath, entry.title, entry.duration, entry.tag, entry.count,
+                 old_hints_json(entry)),
+            )
+
+
+def old_batch_increment_counts(db_path, station, entries):
+    with DBPool.connect(db_path) as connection:
+        cursor = connection.cursor()
+        for entry in entries:
+            cursor.execute(
+                """UPDATE catalog_entries SET count = count + 1, updated_at = CURRENT_TIMESTAMP
+                   WHERE station = ? AND path = ?""",
+                (station, entry.path),
+            )
+
+
+def old_put_liquid_blocks(db_path, station, blocks):
+    with DBPool.connect(db_path) as connection:
+        cursor = connection.cursor()
+        for block in blocks:
+            content_json = json.dumps(block.content.dbid)
+            plan_json = json.dumps([p.toJSON() for p in block.plan])
+            break_info = json.dumps(block.break_info) if block.break_info else None
+            seq_json = json.dumps(block.sequence_key) if block.sequence_key else None
+            cursor.execute(
+                """INSERT OR REPLACE INTO liquid_blocks
+                   (station, liquid_type, start_time, end_time, break_strategy, title, sequence_key, break_info,
+                    content_json, plan_json)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (station, type(block).__name__, block.start_time, block.end_time, block.break_strategy, block.title,
+                 seq_json, break_info, content_json, plan_json),
+            )
+
+
+def old_put_sequence(db_path, station, sequence):
+    with DBPool.connect(db_path) as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            """INSERT OR REPLACE INTO named_sequence
+               (station, sequence_name, tag_path, start_perc, end_perc, current_index) VALUES (?, ?, ?, ?, ?, ?)""",
+            (station, sequence.sequence_name, sequence.tag_path, sequence.start_perc, sequence.end_perc,
+             sequence.current_index),
+        )
+        sequence_id = cursor.lastrowid
+        for index, episode in enumerate(sequence.episodes):
+            cursor.execute(
+                "INSERT INTO sequence_entries (fpath, sequence_index, named_sequence_id) VALUES (?, ?, ?)",
+                (episode.fpath, index, sequence_id),
+            )
+
+
+def timed(write):
+    started = time.perf_counter()
+    write()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk database writes")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    old_db = os.path.join(workdir, "old.db")
+    new_db = os.path.join(workdir, "new.db")
+    StationManager().server_conf["db_path"] = new_db
+    Migrations.ensure(old_db)
+
+    entries = make_entries(args.rows)
+    blocks = make_blocks(args.rows, entries)
+    sequence = NamedSequence("bench", "all", "show", 0, 1, 0, [e.path for e in entries])
+    # every pick counted, a fifth of the catalog played five times each
+    picks = [entries[i % (args.rows // 5)] for i in range(args.rows)]
+
+    cases = [
+        (
+            "catalog entries",
+            lambda: old_put_catalog_entries(old_db, "bench", entries),
+            lambda: CatalogIO().put_catalog_entries("bench", entries),
+        ),
+        (
+            "play counts",
+            lambda: old_batch_increment_counts(old_db, "bench", picks),
+            lambda: CatalogIO().batch_increment_counts("bench", picks),
+        ),
+        (
+            "liquid blocks",
+            lambda: old_put_liquid_blocks(old_db, "bench", blocks),
+            lambda: LiquidIO().put_liquid_blocks("bench", blocks),
+        ),
+        (
+            "sequence entries",
+            lambda: old_put_sequence(old_db, "bench", sequence),
+            lambda: SequenceIO().put_sequence("bench", sequence),
+        ),
+    ]
+
+    print(f"{'write':<18} | {'rows':>7} | {'before rows/s':>13} | {'after rows/s':>12} | {'speedup':>7}")
+    for name, before, after in cases:
+        before_seconds = timed(before)
+        after_seconds = timed(after)
+        print(
+            f"{name:<18} | {args.rows:>7} | {args.rows / before_seconds:>13,.0f} | "
+            f"{args.rows / after_seconds:>12,.0f} | {before_seconds / after_seconds:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Compares the greedy reel fill against the subset-sum solver on a synthetic catalog.
+# Not collected by pytest - run it directly:
+#   python test/bench_reel_fill.py --fills 2000
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from fs42.catalog import ShowCatalog
+from fs42.catalog_entry import CatalogEntry
+from fs42.play_count_buffer import PlayCountBuffer
+from fs42.schedule_hint import BumpHint, DayPartHint
+
+
+def make_catalog(reel_fill, commercials, bumps, seed):
+    config = {
+        "network_name": f"bench-{reel_fill}",
+        "network_type": "standard",
+        "commercial_dir": "commercials",
+        "bump_dir": "bumps",
+        "break_duration": 120,
+        "commercial_free": False,
+        "be_right_back_media": "brb.png",
+        "reel_fill": reel_fill,
+    }
+    catalog = ShowCatalog(config, load=False)
+    rng = random.Random(seed)
+    lengths = [10, 15, 15, 20, 30, 30, 30, 45, 60]
+    catalog.clip_index["commercials"] = [
+        CatalogEntry(
+            f"commercials/{i}.mp4",
+            rng.choice(lengths) - rng.random() * 0.5,
+            "commercials",
+            [DayPartHint("morning")] if i % 10 == 0 else [],
+        )
+        for i in range(commercials)
+    ]
+    catalog.clip_index["bumps"] = [
+        CatalogEntry(f"bumps/{i}.mp4", rng.uniform(3, 12), "bumps", []) for i in range(bumps)
+    ]
+    catalog.clip_index["bumps-prebump"] = [
+        CatalogEntry(f"bumps/pre/{i}.mp4", rng.uniform(3, 8), "bumps-prebump", [BumpHint("pre")]) for i in range(bumps)
+    ]
+    catalog.clip_index["bumps-postbump"] = [
+        CatalogEntry(f"bumps/post/{i}.mp4", rng.uniform(3, 8), "bumps-postbump", [BumpHint("post")])
+        for i in range(bumps)
+    ]
+    return catalog
+
+
+def run(reel_fill, args):
+    catalog = make_catalog(reel_fill, args.commercials, args.bumps, args.seed)
+    rng = random.Random(args.seed)
+    when = datetime.datetime(2024, 1, 1)
+
+    brb_seconds = 0.0
+    brb_fills = 0
+    started = time.perf_counter()
+    for _ in range(args.fills):
+        # the gap a half hour show leaves, sometimes with break points
+        length = 1800 - rng.uniform(1260, 1500)
+        strict_count = rng.choice([None, None, 3, 4])
+        blocks = catalog.make_reel_fill(when, length, strict_count=strict_count)
+        brb = sum(c.duration for b in blocks for c in b.comms if c.tag == "brb")
+        brb_seconds += brb
+        brb_fills += 1 if brb else 0
+        when += datetime.timedelta(minutes=30)
+    elapsed = time.perf_counter() - started
+    return (elapsed, brb_seconds, brb_fills)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark greedy and solver reel fill")
+    parser.add_argument("--fills", type=int, default=1000)
+    parser.add_argument("--commercials", type=int, default=400)
+    parser.add_argument("--bumps", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # play counts stay in memory - there is no catalog in the database to write them to
+    PlayCountBuffer.checkpoint_picks = sys.maxsize
+
+    print(f"{'fill':<8} | {'seconds':>8} | {'ms/fill':>7} | {'brb seconds':>11} | {'fills with brb':>14}")
+    for reel_fill in ["greedy", "solver"]:
+        (elapsed, brb_seconds, brb_fills) = run(reel_fill, args)
+        print(
+            f"{reel_fill:<8} | {elapsed:>8.2f} | {elapsed * 1000 / args.fills:>7.2f} | "
+            f"{brb_seconds:>11.1f} | {brb_fills:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
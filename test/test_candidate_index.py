@@ -0,0 +1,101 @@
+import random
+import sys
+from datetime import datetime, timedelta
+
+from fs42.candidate_index import CandidateIndex
+from fs42.catalog_entry import CatalogEntry
+from fs42.media_processor import MediaProcessor
+from fs42.schedule_hint import DayPartHint, MonthHint
+
+
+def fixture_entries():
+    # few distinct durations and counts so most lookups have to break ties
+    rng = random.Random(3)
+    entries = []
+    for i in range(200):
+        hints = []
+        if i % 7 == 0:
+            hints = [DayPartHint("prime")]
+        elif i % 11 == 0:
+            hints = [MonthHint("January")]
+        entry = CatalogEntry(f"commercials/{i}.mp4", rng.choice([0.5, 10, 15, 15, 30, 30, 60]), "commercials", hints)
+        entry.count = rng.choice([0, 0, 1, 3])
+        entries.append(entry)
+    return entries
+
+
+def scan_matches(entries, seconds, when):
+    # the linear scan find_candidate used before the index
+    return [
+        entry
+        for entry in entries
+        if entry.duration < seconds
+        and entry.duration >= 1
+        and MediaProcessor._test_candidate_hints(entry.hints, when)
+    ]
+
+
+def lowest_count(candidates):
+    # ShowCatalog._lowest_count before the play count buckets
+    min_count = sys.maxsize
+    lowest_matches = []
+    for candidate in candidates:
+        if candidate.count < min_count:
+            min_count = candidate.count
+            lowest_matches = [candidate]
+        elif candidate.count == min_count:
+            lowest_matches.append(candidate)
+
+    return random.choice(lowest_matches)
+
+
+class TestCandidateIndex:
+    def test_candidates_match_scan(self):
+        entries = fixture_entries()
+        index = CandidateIndex(entries)
+        when = datetime(2024, 1, 1)
+        for _ in range(100):
+            for seconds in [1, 11, 15, 16, 31, 61]:
+                expected = {entry.path for entry in scan_matches(entries, seconds, when)}
+                assert {entry.path for entry in index.eligible(seconds, when, len(entries))} == expected
+            index.increment(entries[(when.hour * 13) % len(entries)])
+            when += timedelta(hours=7)
+
+    def test_picks_match_scan(self):
+        scanned = fixture_entries()
+        index = CandidateIndex(fixture_entries())
+        when = datetime(2024, 1, 1)
+        rng = random.Random(5)
+        for i in range(600):
+            seconds = rng.choice([11, 16, 31, 61, 120])
+            matches = scan_matches(scanned, seconds, when)
+            lowest = min(entry.count for entry in matches)
+            random.seed(i)
+            expected = random.choice([entry for entry in matches if entry.count == lowest])
+            expected.count += 1
+
+            random.seed(i)
+            picked = index.pick_lowest(seconds, when)
+            index.increment(picked)
+            assert picked.path == expected.path
+            when += timedelta(minutes=rng.choice([1, 30, 90]))
+        assert [entry.count for entry in index.entries] == [entry.count for entry in scanned]
+
+    def test_lowest_count_tie_break(self):
+        # the longest entries come first in the catalog, so bucket order differs from catalog order
+        entries = [
+            CatalogEntry(f"bumps/{i}.mp4", 40 - (i % 4) * 10, "bumps", [], count=i % 3) for i in range(24)
+        ]
+        index = CandidateIndex(entries)
+        when = datetime(2024, 3, 1, 12)
+        for seed in range(200):
+            for seconds in [15, 25, 45]:
+                random.seed(seed)
+                expected = lowest_count(scan_matches(entries, seconds, when))
+                random.seed(seed)
+                assert index.pick_lowest(seconds, when) is expected
+
+    def test_no_candidates(self):
+        index = CandidateIndex(fixture_entries())
+        assert index.pick_lowest(1, datetime(2024, 1, 1)) is None
+        assert index.eligible(1, datetime(2024, 1, 1), 10) == []
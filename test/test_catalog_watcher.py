@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_watcher import CatalogWatcher, InotifyWatcher, PollingWatcher
+from fs42.db_pool import DBPool
+from fs42.media_processor import MediaProcessor
+from fs42.station_manager import StationManager
+from fs42.timings import DAYS
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    # there is no ffprobe here - every probe reports 12 seconds and is recorded
+    paths = []
+
+    def probe_one(file_name):
+        paths.append(file_name)
+        return (12.0, {"duration": 12.0})
+
+    monkeypatch.setattr(MediaProcessor, "probe_one", staticmethod(probe_one))
+    return paths
+
+
+def write(path, data=b"media"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def station_config(content_dir):
+    config = {
+        "network_name": "watched",
+        "network_type": "standard",
+        "_has_catalog": True,
+        "content_dir": content_dir,
+        "commercial_dir": "commercials",
+        "bump_dir": "bumps",
+    }
+    config.update({day: {"20": {"tags": "show"}} for day in DAYS})
+    return config
+
+
+class ScriptedWatcher:
+    """Hands out one batch of events per poll, then goes quiet"""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def poll(self, timeout):
+        batch = self.batches.pop(0) if len(self.batches) else []
+        if not len(batch):
+            time.sleep(timeout)
+        return batch
+
+    def close(self):
+        pass
+
+
+class TestCatalogWatcher:
+    def test_polling_only_reports_media(self, tmp_path):
+        root = str(tmp_path)
+        write(f"{root}/show/a.mp4")
+        watcher = PollingWatcher([root], interval=0)
+        write(f"{root}/show/b.mp4")
+        write(f"{root}/show/b.nfo")
+        write(f"{root}/show/c.mp4.part")
+        os.remove(f"{root}/show/a.mp4")
+        assert sorted(watcher.poll(0)) == [("changed", f"{root}/show/b.mp4"), ("removed", f"{root}/show/a.mp4")]
+        assert watcher.poll(0) == []
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+    def test_inotify_only_reports_media(self, tmp_path):
+        root = str(tmp_path)
+        os.makedirs(f"{root}/show")
+        watcher = InotifyWatcher([root])
+        try:
+            write(f"{root}/show/a.mp4")
+            write(f"{root}/show/a.srt")
+            write(f"{root}/show/notes.txt")
+            write(f"{root}/show/b.mp4.part")
+            os.remove(f"{root}/show/notes.txt")
+            assert watcher.poll(1) == [("changed", f"{root}/show/a.mp4")]
+        finally:
+            watcher.close()
+
+    def test_debounce_and_rescan(self, tmp_path, monkeypatch):
+        watcher = CatalogWatcher([station_config(str(tmp_path))], debounce=0.2, use_inotify=False)
+        watcher._watcher = ScriptedWatcher(
+            [
+                [("changed", "/c/a.mp4"), ("changed", "/c/b.mp4")],
+                [("removed", "/c/a.mp4")],
+                [],
+                [],
+                [("rescan", None)],
+            ]
+        )
+        applied = []
+        rescans = []
+        monkeypatch.setattr(watcher, "_apply", lambda changed, removed: applied.append((changed, removed)))
+        monkeypatch.setattr(watcher, "_rescan", lambda: rescans.append(True))
+
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not len(rescans) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        watcher.stop()
+        thread.join()
+
+        # the burst is applied once, after it went quiet, with the later removal winning
+        assert applied == [({"/c/b.mp4"}, {"/c/a.mp4"})]
+        assert rescans == [True]
+
+    def test_apply_updates_catalog(self, tmp_path, db_path, probed):
+        content_dir = str(tmp_path / "content")
+        write(f"{content_dir}/show/old.mp4")
+        write(f"{content_dir}/show/new.mp4", b"new media")
+        config = station_config(content_dir)
+        reloads = []
+        watcher = CatalogWatcher([config], on_reload=lambda: reloads.append(True), use_inotify=False)
+
+        watcher._apply({f"{content_dir}/show/old.mp4"}, set())
+        assert [entry.path for entry in CatalogAPI.get_entries(config)] == [f"{content_dir}/show/old.mp4"]
+
+        os.remove(f"{content_dir}/show/old.mp4")
+        watcher._apply({f"{content_dir}/show/new.mp4"}, {f"{content_dir}/show/old.mp4"})
+        entries = CatalogAPI.get_entries(config)
+        assert [(entry.path, entry.tag, entry.duration) for entry in entries] == [
+            (f"{content_dir}/show/new.mp4", "show", 12.0)
+        ]
+        # each file is probed once - the catalog reuses the file cache
+        assert sorted(os.path.basename(path) for path in probed) == ["new.mp4", "old.mp4"]
+        assert reloads == [True, True]
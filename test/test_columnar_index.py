@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from fs42.candidate_index import CandidateIndex
+from fs42.catalog_entry import CatalogEntry
+from fs42.columnar_index import NUMPY_AVAILABLE, ColumnarIndex
+from fs42.schedule_hint import DayPartHint
+
+pytestmark = pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy is not installed")
+
+
+def fixture_entries():
+    # few distinct durations and counts so most lookups have to break ties
+    rng = random.Random(7)
+    entries = []
+    for i in range(300):
+        hints = [DayPartHint("morning")] if i % 9 == 0 else []
+        entry = CatalogEntry(f"commercials/{i}.mp4", rng.choice([0.5, 10, 15, 15.5, 30, 30, 60]), "commercials", hints)
+        entry.count = rng.choice([0, 0, 1, 2])
+        entries.append(entry)
+    return entries
+
+
+def paths(entries):
+    return [entry.path for entry in entries]
+
+
+class TestColumnarIndex:
+    def test_pick_parity(self):
+        candidates = CandidateIndex(fixture_entries())
+        columnar = ColumnarIndex(fixture_entries())
+        when = datetime(2024, 1, 1)
+        rng = random.Random(11)
+        for _ in range(500):
+            seconds = rng.choice([5, 16, 31, 61, 120])
+            random.seed(when.toordinal() * 100 + when.hour)
+            expected = candidates.pick_lowest(seconds, when)
+            random.seed(when.toordinal() * 100 + when.hour)
+            picked = columnar.pick_lowest(seconds, when)
+            if expected is None:
+                assert picked is None
+            else:
+                assert picked.path == expected.path
+                candidates.increment(expected)
+                columnar.increment(picked)
+            when += timedelta(minutes=rng.choice([1, 30, 90]))
+
+    def test_eligible_parity(self):
+        candidates = CandidateIndex(fixture_entries())
+        columnar = ColumnarIndex(fixture_entries())
+        when = datetime(2024, 1, 1, 6)
+        for seed in range(50):
+            for seconds, limit in [(16, 10), (31, 60), (61, 500)]:
+                random.seed(seed)
+                expected = candidates.eligible(seconds, when, limit)
+                random.seed(seed)
+                assert paths(columnar.eligible(seconds, when, limit)) == paths(expected)
+            # move a few entries up a tier between rounds
+            for entry in expected[:3]:
+                candidates.increment(entry)
+                columnar.increment(columnar.entries[candidates.positions[id(entry)]])
+            when += timedelta(hours=5)
+
+    def test_no_candidates(self):
+        columnar = ColumnarIndex(fixture_entries())
+        assert columnar.pick_lowest(1, datetime(2024, 1, 1)) is None
+        assert columnar.eligible(1, datetime(2024, 1, 1), 10) == []
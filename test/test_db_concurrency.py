@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fs42.db_pool import DBPool
+from fs42.liquid_io import LiquidIO
+from fs42.station_manager import StationManager
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+def block_rows(station, days):
+    # a half hour block every slot with a plan about the size a real one has
+    plan = json.dumps([{"path": f"/media/{i}.mp4", "skip": 0, "duration": 30.0, "is_stream": False} for i in range(40)])
+    for i in range(days * 48):
+        start = START + timedelta(minutes=30 * i)
+        yield (station, "LiquidOffAirBlock", start, start + timedelta(minutes=30), "standard", f"Show {i}", plan)
+
+
+def write_month(db_path, started, hold):
+    with DBPool.connect(db_path) as connection:
+        connection.executemany(
+            """INSERT INTO liquid_blocks
+               (station, liquid_type, start_time, end_time, break_strategy, title, content_json, plan_json)
+               VALUES (?, ?, ?, ?, ?, ?, 'null', ?)""",
+            block_rows("writer", 31),
+        )
+        started.set()
+        # keep the write transaction open while the reader works
+        time.sleep(hold)
+
+
+class TestDBConcurrency:
+    def test_wal_mode(self, db_path):
+        LiquidIO()
+        assert DBPool.connect(db_path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_readonly_connection(self, db_path):
+        LiquidIO()
+        with pytest.raises(Exception):
+            DBPool.connect(db_path, readonly=True).execute("DELETE FROM liquid_blocks")
+
+    def test_reads_during_month_write(self, db_path):
+        io = LiquidIO()
+        with DBPool.connect(db_path) as connection:
+            connection.executemany(
+                """INSERT INTO liquid_blocks
+                   (station, liquid_type, start_time, end_time, break_strategy, title, content_json, plan_json)
+                   VALUES (?, ?, ?, ?, ?, ?, 'null', ?)""",
+                block_rows("reader", 1),
+            )
+
+        started = threading.Event()
+        writer = threading.Thread(target=write_month, args=(db_path, started, 1.0))
+        writer.start()
+        started.wait()
+
+        latencies = []
+        while writer.is_alive():
+            before = time.perf_counter()
+            blocks = io.query_liquid_blocks("reader", START, START + timedelta(hours=6))
+            latencies.append(time.perf_counter() - before)
+            assert len(blocks) == 12
+        writer.join()
+
+        assert len(latencies) > 10
+        assert max(latencies) < 0.5
+        assert len(io.query_liquid_blocks("writer", START, START + timedelta(days=31))) == 31 * 48
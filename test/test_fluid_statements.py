@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from fs42.db_pool import DBPool
+from fs42.fluid_builder import FluidBuilder
+from fs42.fluid_statements import FluidStatements
+from fs42.media_processor import MediaProcessor
+from fs42.station_manager import StationManager
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    # there is no ffprobe here - probes report 30 seconds but no stream metadata, and are recorded
+    paths = []
+
+    def probe_one(file_name):
+        paths.append(file_name)
+        return (30.0, None)
+
+    monkeypatch.setattr(MediaProcessor, "probe_one", staticmethod(probe_one))
+    return paths
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def rows(db_path):
+    return DBPool.connect(db_path).execute("SELECT path, duration, meta FROM file_meta ORDER BY path").fetchall()
+
+
+class TestFluidStatements:
+    def test_empty_probe_not_repeated(self, tmp_path, db_path, probed):
+        content = str(tmp_path / "content")
+        write(f"{content}/show/a.mp4", b"a" * 1000)
+        fluid = FluidBuilder(db_path)
+        fluid.scan_file_cache(content)
+        fluid.scan_file_cache(content)
+        assert probed == [f"{content}/show/a.mp4"]
+        assert rows(db_path) == [(f"{content}/show/a.mp4", 30.0, "{}")]
+
+    def test_legacy_rows_probed_once(self, tmp_path, db_path, probed):
+        content = str(tmp_path / "content")
+        write(f"{content}/show/a.mp4", b"a" * 1000)
+        fluid = FluidBuilder(db_path)
+        fluid.scan_file_cache(content)
+        # rows cached before probe metadata was stored have an empty meta column
+        with DBPool.connect(db_path) as connection:
+            connection.execute("UPDATE file_meta SET meta = ''")
+        fluid.scan_file_cache(content)
+        fluid.scan_file_cache(content)
+        assert len(probed) == 2
+        assert rows(db_path)[0][2] == "{}"
+
+    def test_move_between_scans(self, tmp_path, db_path, probed):
+        old = str(tmp_path / "old")
+        new = str(tmp_path / "new")
+        write(f"{old}/show/a.mp4", b"a" * 1000)
+        write(f"{old}/show/b.mp4", b"b" * 1000)
+        fluid = FluidBuilder(db_path)
+        fluid.scan_file_cache(old)
+        connection = DBPool.connect(db_path)
+        FluidStatements.add_break_points(connection, f"{old}/show/a.mp4", [{"black_start": 60.0}])
+
+        # the folder moves to a content dir that is scanned on its own, after the old one
+        os.makedirs(new)
+        os.rename(f"{old}/show", f"{new}/show")
+        found = MediaProcessor.rich_find_media(old)
+        for _ in range(2):
+            delta = FluidStatements.iterate_file_entries(connection, found, old)
+            # both rows have a fingerprint, so they wait for the move instead of being deleted
+            assert (delta["removed"], delta["kept"]) == (0, 2)
+
+        delta = FluidStatements.iterate_file_entries(connection, MediaProcessor.rich_find_media(new), new)
+        assert (delta["moved"], delta["added"]) == (2, 0)
+        assert rows(db_path) == [(f"{new}/show/a.mp4", 30.0, "{}"), (f"{new}/show/b.mp4", 30.0, "{}")]
+        assert FluidStatements.get_break_points(connection, f"{new}/show/a.mp4") == [{"black_start": 60.0}]
+        assert FluidStatements.get_break_points(connection, f"{old}/show/a.mp4") == {}
+        # nothing was probed a second time
+        assert len(probed) == 2
+
+        delta = FluidStatements.iterate_file_entries(connection, [], old)
+        assert (delta["removed"], delta["kept"]) == (0, 0)
+
+    def test_unmatchable_rows_removed(self, tmp_path, db_path, probed):
+        content = str(tmp_path / "content")
+        write(f"{content}/show/a.mp4", b"a" * 1000)
+        fluid = FluidBuilder(db_path)
+        fluid.scan_file_cache(content)
+        connection = DBPool.connect(db_path)
+        # a row cached before fingerprints, without break points, can never be matched as a move
+        with connection:
+            connection.execute("UPDATE file_meta SET fingerprint = NULL")
+        os.remove(f"{content}/show/a.mp4")
+        delta = FluidStatements.iterate_file_entries(connection, [], content)
+        assert (delta["removed"], delta["kept"]) == (1, 0)
+        assert rows(db_path) == []
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from fs42.hint_mask import HintMask
+from fs42.media_processor import MediaProcessor
+from fs42.schedule_hint import BumpHint, DayPartHint, MonthHint, QuarterHint, RangeHint
+
+
+def every_half_hour(year):
+    when = datetime(year, 1, 1)
+    while when.year == year:
+        yield when
+        when += timedelta(minutes=30)
+
+
+def assert_agrees(hints, years=(2023, 2024)):
+    mask = HintMask.compile(hints)
+    assert mask is not None
+    for year in years:
+        for when in every_half_hour(year):
+            assert mask.allows(when) == MediaProcessor._test_candidate_hints(hints, when), when
+
+
+class TestHintMask:
+    def test_no_hints(self):
+        mask = HintMask.compile([])
+        assert mask.allows(datetime(2024, 2, 29, 13, 30))
+        assert mask.allows(datetime(2023, 12, 31, 0, 0))
+
+    def test_month(self):
+        assert_agrees([MonthHint("November")])
+        assert_agrees([MonthHint("February")])
+
+    def test_quarter(self):
+        for quarter in ["q1", "q2", "q3", "q4"]:
+            assert_agrees([QuarterHint(quarter)])
+
+    def test_range(self):
+        assert_agrees([RangeHint("December 1 - December 25")])
+        assert_agrees([RangeHint("February 28 - March 1")])
+
+    def test_range_cross_year(self):
+        assert_agrees([RangeHint("December 1 - January 31")])
+        assert_agrees([RangeHint("November 15 - January 15")])
+
+    def test_range_end_day_is_midnight_only(self):
+        mask = HintMask.compile([RangeHint("December 1 - December 25")])
+        assert mask.allows(datetime(2024, 12, 25, 0, 0))
+        assert not mask.allows(datetime(2024, 12, 25, 0, 30))
+        assert mask.allows(datetime(2024, 12, 1, 0, 0))
+
+    def test_day_part(self):
+        assert_agrees([DayPartHint("morning")], years=(2024,))
+        assert_agrees([DayPartHint("overnight")], years=(2024,))
+
+    def test_bump(self):
+        assert_agrees([BumpHint("pre")], years=(2024,))
+
+    def test_combined(self):
+        assert_agrees([DayPartHint("prime"), MonthHint("December"), RangeHint("December 20 - January 5")])
+        assert_agrees([QuarterHint("q2"), BumpHint("post"), DayPartHint("late")], years=(2023,))
+
+    def test_shared_compile(self):
+        assert HintMask.compile([MonthHint("July")]) is HintMask.compile([MonthHint("July")])
+
+    def test_unknown_hint(self):
+        class OddHint:
+            def hint(self, when):
+                return True
+
+        assert HintMask.compile([OddHint()]) is None
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+from fs42.migrations import Migrations
+
+
+def legacy_db(path):
+    # the schema as it was before user_version was tracked
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE file_meta (path TEXT PRIMARY KEY, duration REAL, size INTEGER,
+                          first_added TIMESTAMP, last_mod TIMESTAMP, last_checked TIMESTAMP,
+                          last_updated TIMESTAMP, meta TEXT)""")
+    connection.execute("""CREATE TABLE catalog_entries (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          station TEXT NOT NULL, path TEXT NOT NULL, title TEXT NOT NULL,
+                          duration REAL NOT NULL, tag TEXT NOT NULL, count INTEGER DEFAULT 0, hints TEXT,
+                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                          updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(station, tag, path))""")
+    connection.executemany(
+        "INSERT INTO catalog_entries (station, path, title, duration, tag) VALUES ('s', ?, ?, 10, 'content')",
+        [(f"catalog/show {i}.mp4", f"show {i}") for i in range(50)],
+    )
+    connection.commit()
+    connection.close()
+
+
+def columns(connection, table):
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+class TestMigrations:
+    def test_new_database(self, tmp_path):
+        connection = sqlite3.connect(tmp_path / "new.db")
+        assert Migrations.migrate(connection) == len(Migrations.steps)
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == len(Migrations.steps)
+        assert "fingerprint" in columns(connection, "file_meta")
+        assert "realpath" in columns(connection, "catalog_entries")
+
+    def test_legacy_database(self, tmp_path):
+        path = tmp_path / "legacy.db"
+        legacy_db(path)
+        connection = sqlite3.connect(path)
+        Migrations.migrate(connection)
+
+        rows = connection.execute("SELECT path, realpath FROM catalog_entries").fetchall()
+        assert len(rows) == 50
+        assert all(realpath == os.path.realpath(path) for (path, realpath) in rows)
+        assert "fingerprint" in columns(connection, "file_meta")
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == len(Migrations.steps)
+
+    def test_search_index_backfilled(self, tmp_path):
+        path = tmp_path / "legacy.db"
+        legacy_db(path)
+        connection = sqlite3.connect(path)
+        Migrations.migrate(connection)
+        found = connection.execute(
+            "SELECT COUNT(*) FROM catalog_entries_fts WHERE catalog_entries_fts MATCH '\"show\"*'"
+        ).fetchone()[0]
+        assert found == 50
+
+    def test_runs_once(self, tmp_path):
+        connection = sqlite3.connect(tmp_path / "new.db")
+        Migrations.migrate(connection)
+        connection.execute("INSERT INTO catalog_entries (station, path, title, duration, tag) VALUES ('s', 'p', 't', 1, 'c')")
+        connection.commit()
+        Migrations.migrate(connection)
+        # the backfill and the search index rebuild must not run a second time
+        assert connection.execute("SELECT realpath FROM catalog_entries").fetchone()[0] is None
+        assert connection.execute("SELECT COUNT(*) FROM catalog_entries_fts").fetchone()[0] == 1
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_entry import CatalogEntry
+from fs42.db_pool import DBPool
+from fs42.liquid_schedule import LiquidSchedule
+from fs42.play_count_buffer import PlayCountBuffer
+from fs42.sequence import NamedSequence
+from fs42.sequence_io import SequenceIO
+from fs42.station_manager import StationManager
+from fs42.timings import DAYS
+
+EPISODES = [f"catalog/show/episode {i}.mp4" for i in range(4)]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+def station_config():
+    # even hours play the show in sequence, odd hours pick a movie - every hour has a break to fill
+    slots = {}
+    for hour in range(24):
+        if hour % 2:
+            slots[str(hour)] = {"tags": "movie"}
+        else:
+            slots[str(hour)] = {"tags": "show", "sequence": "run"}
+    config = {
+        "network_name": "counts",
+        "network_type": "standard",
+        "schedule_increment": 60,
+        "break_strategy": "end",
+        "break_duration": 120,
+        "commercial_dir": "commercials",
+        "bump_dir": "bumps",
+        "commercial_free": False,
+        "clip_shows": [],
+    }
+    config.update({day: slots for day in DAYS})
+    return config
+
+
+def catalog_entries():
+    entries = [CatalogEntry(path, 1500, "show", []) for path in EPISODES]
+    entries += [CatalogEntry(f"catalog/movie/{i}.mp4", 2900 + i * 100, "movie", []) for i in range(3)]
+    entries += [CatalogEntry(f"catalog/commercials/{i}.mp4", 15 + i * 5, "commercials", []) for i in range(12)]
+    entries += [CatalogEntry(f"catalog/bumps/{i}.mp4", 5 + i, "bumps", []) for i in range(6)]
+    return entries
+
+
+def stored_counts(config):
+    return {entry.path: entry.count for entry in CatalogAPI.get_entries(config)}
+
+
+class TestPlayCounts:
+    def build_day(self, config):
+        CatalogAPI.set_entries(config, catalog_entries())
+        SequenceIO().put_sequence(config["network_name"], NamedSequence("counts", "run", "show", 0, 1, 0, EPISODES))
+        schedule = LiquidSchedule(config)
+        schedule._fluid(datetime(2024, 1, 1), datetime(2024, 1, 2))
+        return schedule
+
+    @pytest.mark.parametrize("checkpoint_picks", [5000, 7])
+    def test_counts_saved_after_build(self, db_path, monkeypatch, checkpoint_picks):
+        # a small checkpoint flushes many times during the build
+        monkeypatch.setattr(PlayCountBuffer, "checkpoint_picks", checkpoint_picks)
+        config = station_config()
+        schedule = self.build_day(config)
+        counts = stored_counts(config)
+
+        # every find_candidate pick bumps the in-memory count - the database has to agree once the build is done
+        picked = {
+            entry.path: entry.count
+            for tag in ["movie", "commercials", "bumps"]
+            for entry in schedule.catalog.clip_index[tag]
+        }
+        assert sum(picked.values()) > 0
+        assert {path: counts[path] for path in picked} == picked
+        # sequence picks are counted even though they skip find_candidate
+        assert [counts[path] for path in EPISODES] == [3, 3, 3, 3]
+        assert len(schedule.catalog.play_counts) == 0
+
+    def test_checkpoint_flush(self, db_path, monkeypatch):
+        monkeypatch.setattr(PlayCountBuffer, "checkpoint_picks", 5)
+        config = station_config()
+        CatalogAPI.set_entries(config, catalog_entries())
+        buffer = PlayCountBuffer(config)
+        entry = CatalogEntry("catalog/bumps/0.mp4", 5, "bumps", [])
+
+        for _ in range(4):
+            buffer.record(entry)
+        assert stored_counts(config)[entry.path] == 0
+        buffer.record(entry)
+        assert stored_counts(config)[entry.path] == 5
+        assert len(buffer) == 0
+
+        buffer.record(entry, plays=2)
+        assert buffer.flush() == 1
+        assert stored_counts(config)[entry.path] == 7
+        assert buffer.flush() == 0
@@ -0,0 +1,102 @@
+import pytest
+
+from fs42.catalog_entry import CatalogEntry
+from fs42.catalog_io import CatalogIO
+from fs42.db_pool import DBPool
+from fs42.search_query import SearchQuery
+from fs42.station_manager import StationManager
+
+
+class TestSearchQuery:
+    def test_words_become_prefix_terms(self):
+        assert SearchQuery.to_match("star tre") == '"star"* "tre"*'
+
+    def test_operators_are_not_parsed(self):
+        assert SearchQuery.to_match('cola OR "ad" -bump (x') == '"cola"* "OR"* "ad"* "bump"* "x"*'
+
+    def test_nothing_to_search(self):
+        assert SearchQuery.to_match("") == ""
+        assert SearchQuery.to_match(" -- ") == ""
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+def entry(path, tag, duration=30.0):
+    return CatalogEntry(path, duration, tag, [])
+
+
+def index_rows(db_path):
+    connection = DBPool.connect(db_path)
+    indexed = connection.execute("SELECT rowid, title, tag, path FROM catalog_entries_fts ORDER BY rowid").fetchall()
+    stored = connection.execute("SELECT id, title, tag, path FROM catalog_entries ORDER BY id").fetchall()
+    return (indexed, stored)
+
+
+def paths(entries):
+    return [e.path for e in entries]
+
+
+class TestCatalogSearch:
+    def entries(self):
+        return [
+            entry("shows/star trek.mp4", "shows"),
+            entry("shows/trekking/other.mp4", "shows"),
+            entry("shows/star wars.mp4", "shows"),
+            entry("commercials/cola.mp4", "commercials"),
+        ]
+
+    def test_prefix_matches_ranked(self, db_path):
+        io = CatalogIO()
+        assert io.has_fts
+        io.put_catalog_entries("s", self.entries())
+        io.put_catalog_entries("other", [entry("shows/star trek.mp4", "shows")])
+
+        # the title and path match beats a match in the path alone
+        assert paths(io.search_catalog_entries("s", "trek")) == ["shows/star trek.mp4", "shows/trekking/other.mp4"]
+        assert paths(io.search_catalog_entries("s", "sta tre")) == ["shows/star trek.mp4"]
+        assert paths(io.search_catalog_entries("s", "COLA")) == ["commercials/cola.mp4"]
+        assert io.search_catalog_entries("s", "pepsi") == []
+
+    def test_punctuation_only(self, db_path):
+        io = CatalogIO()
+        io.put_catalog_entries("s", self.entries())
+        for query in ["", "--", "/", '"()*"']:
+            assert io.search_catalog_entries("s", query) == []
+            io.has_fts = False
+            assert io.search_catalog_entries("s", query) == []
+            io.has_fts = True
+
+    def test_like_fallback(self, db_path):
+        io = CatalogIO()
+        io.put_catalog_entries("s", self.entries())
+        io.has_fts = False
+        # without the index there is no rank, matches come back by tag and title
+        assert paths(io.search_catalog_entries("s", "trek")) == ["shows/trekking/other.mp4", "shows/star trek.mp4"]
+        assert paths(io.search_catalog_entries("s", "cola")) == ["commercials/cola.mp4"]
+
+    def test_index_follows_writes(self, db_path):
+        io = CatalogIO()
+        io.put_catalog_entries("s", self.entries())
+        (indexed, stored) = index_rows(db_path)
+        assert indexed == stored
+
+        # put replaces rows that are already there
+        io.put_catalog_entries("s", [entry("shows/star trek.mp4", "shows", 40.0)])
+        (indexed, stored) = index_rows(db_path)
+        assert indexed == stored
+
+        # sync inserts, updates in place and deletes
+        changed = entry("shows/star wars.mp4", "shows", 50.0)
+        changed.title = "star wars special edition"
+        io.sync_catalog_entries("s", [entry("shows/star trek.mp4", "shows"), changed, entry("shows/new.mp4", "shows")])
+        (indexed, stored) = index_rows(db_path)
+        assert indexed == stored
+        assert len(stored) == 3
+        assert paths(io.search_catalog_entries("s", "special")) == ["shows/star wars.mp4"]
+        assert io.search_catalog_entries("s", "cola") == []
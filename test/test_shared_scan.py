@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from fs42.catalog import ShowCatalog
+from fs42.catalog_api import CatalogAPI
+from fs42.db_pool import DBPool
+from fs42.media_processor import MediaProcessor
+from fs42.shared_scan import SharedScan
+from fs42.station_manager import StationManager
+from fs42.timings import DAYS
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    # there is no ffprobe here - every probe reports 20 seconds and is recorded
+    paths = []
+
+    def probe_one(file_name):
+        paths.append(os.path.realpath(file_name))
+        return (20.0, {"duration": 20.0})
+
+    monkeypatch.setattr(MediaProcessor, "probe_one", staticmethod(probe_one))
+    return paths
+
+
+@pytest.fixture
+def walks(monkeypatch):
+    walked = []
+    walk_media = MediaProcessor.walk_media
+
+    def counted(path, recursive=True, with_stat=True):
+        walked.append(os.path.realpath(path))
+        return walk_media(path, recursive, with_stat)
+
+    monkeypatch.setattr(MediaProcessor, "walk_media", staticmethod(counted))
+    return walked
+
+
+def write(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(path.encode())
+
+
+def station_config(name, content_dir, tag):
+    config = {
+        "network_name": name,
+        "network_type": "standard",
+        "content_dir": content_dir,
+        "commercial_dir": "commercials",
+        "bump_dir": "bumps",
+    }
+    config.update({day: {"20": {"tags": tag}} for day in DAYS})
+    return config
+
+
+class TestSharedScan:
+    def test_shared_folder_walked_and_probed_once(self, tmp_path, db_path, probed, walks):
+        content = str(tmp_path / "content")
+        files = [
+            f"{content}/news/a.mp4",
+            f"{content}/news/morning/b.mp4",
+            f"{content}/sports/c.mp4",
+            f"{content}/commercials/d.mp4",
+            f"{content}/bumps/e.mp4",
+            f"{content}/bumps/pre/f.mp4",
+        ]
+        for path in files:
+            write(path)
+        # the second station reaches the same folder through a symlink
+        os.symlink(content, str(tmp_path / "linked"))
+        first = station_config("first", content, "news")
+        second = station_config("second", str(tmp_path / "linked"), "sports")
+
+        scan = SharedScan()
+        ShowCatalog(first, rebuild_catalog=True, shared_scan=scan)
+        ShowCatalog(second, rebuild_catalog=True, shared_scan=scan)
+
+        assert walks == [content]
+        assert sorted(probed) == sorted(files)
+        assert "walked 1 of" in scan.report()
+
+        first_paths = sorted(entry.path for entry in CatalogAPI.get_entries(first))
+        assert first_paths == sorted(path for path in files if "/sports/" not in path)
+        second_paths = sorted(entry.path for entry in CatalogAPI.get_entries(second))
+        assert second_paths == sorted(
+            path.replace(content, str(tmp_path / "linked")) for path in files if "/news/" not in path
+        )
+
+    def test_listings_match_the_walker(self, tmp_path, walks):
+        root = str(tmp_path)
+        for path in ["show/a.mp4", "show/s1/b.mp4", "show/s1/deep/c.mp4", "show/.hidden/d.mp4", "other/e.mp4"]:
+            write(f"{root}/{path}")
+        scan = SharedScan()
+        scan.find_media(root, True)
+        for folder in ["show", "show/s1"]:
+            for recursive in [False, True]:
+                expected = [fp for (fp, _rp, _sz, _mt) in MediaProcessor.walk_media(f"{root}/{folder}", recursive)]
+                assert scan.find_media(f"{root}/{folder}", recursive) == expected
+        # hidden folders are skipped by the parent walk, so they get their own
+        assert scan.find_media(f"{root}/show/.hidden") == [f"{root}/show/.hidden/d.mp4"]
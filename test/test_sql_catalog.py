@@ -0,0 +1,123 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from fs42.catalog import ShowCatalog
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_entry import CatalogEntry
+from fs42.db_pool import DBPool
+from fs42.play_count_buffer import PlayCountBuffer
+from fs42.schedule_hint import DayPartHint
+from fs42.station_manager import StationManager
+from fs42.timings import DAYS
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", path)
+    yield path
+    DBPool.close(path)
+
+
+def station_config(backend):
+    config = {
+        "network_name": "sql",
+        "network_type": "standard",
+        "catalog_backend": backend,
+        "commercial_dir": "commercials",
+        "bump_dir": "bumps",
+    }
+    config.update({day: {} for day in DAYS})
+    return config
+
+
+def catalog_entries():
+    rng = random.Random(9)
+    entries = []
+    for i in range(120):
+        hints = [DayPartHint("prime")] if i % 6 == 0 else []
+        entry = CatalogEntry(f"catalog/commercials/{i:03}.mp4", rng.choice([0.5, 10, 15, 30, 30, 60]), "commercials", hints)
+        entry.count = rng.choice([0, 0, 1, 2])
+        entries.append(entry)
+    entries += [CatalogEntry(f"catalog/bumps/{i}.mp4", 5 + i, "bumps", []) for i in range(5)]
+    entries.append(CatalogEntry("catalog/sign_off.mp4", 40, "sign_off", []))
+    return entries
+
+
+def lowest(catalog, tag, seconds, when):
+    # the least played candidates the in-memory backend chooses from
+    found = catalog._tag_index(tag).eligible(seconds, when, 1000)
+    if not len(found):
+        return set()
+    count = min(entry.count for entry in found)
+    return {entry.path for entry in found if entry.count == count}
+
+
+class TestSqlCatalog:
+    def load(self):
+        CatalogAPI.set_entries(station_config("memory"), catalog_entries())
+        return (ShowCatalog(station_config("memory")), ShowCatalog(station_config("sql")))
+
+    @pytest.mark.parametrize("checkpoint_picks", [5000, 9])
+    def test_picks_agree_with_memory(self, db_path, monkeypatch, checkpoint_picks):
+        monkeypatch.setattr(PlayCountBuffer, "checkpoint_picks", checkpoint_picks)
+        (memory, sql) = self.load()
+        when = datetime(2024, 1, 1)
+        rng = random.Random(4)
+        for _ in range(300):
+            seconds = rng.choice([11, 16, 31, 61])
+            expected = lowest(memory, "commercials", seconds, when)
+            first_tier = next(sql.backend.tiers("commercials", seconds, when))
+            assert {sql.backend.by_id(dbid).path for dbid in first_tier} == expected
+
+            picked = sql.find_candidate("commercials", seconds, when)
+            assert picked.path in expected
+            # play the same entry on the in-memory side so both stay in step
+            mirror = next(e for e in memory.clip_index["commercials"] if e.path == picked.path)
+            memory._tag_index("commercials").increment(mirror)
+            assert picked.count == mirror.count
+            when += timedelta(minutes=rng.choice([1, 30, 90]))
+
+        sql.save_play_counts()
+        stored = {entry.path: entry.count for entry in CatalogAPI.get_entries(station_config("sql"))}
+        assert {entry.path: stored[entry.path] for entry in memory.clip_index["commercials"]} == {
+            entry.path: entry.count for entry in memory.clip_index["commercials"]
+        }
+
+    def test_unsaved_plays_are_deferred(self, db_path):
+        (_memory, sql) = self.load()
+        when = datetime(2024, 1, 1, 12)
+        picked = set()
+        # every 15 second commercial once, without saving - none of them may come up again first
+        fits = [e for e in catalog_entries() if e.tag == "commercials" and 1 <= e.duration < 16 and e.count == 0]
+        fits = [e for e in fits if not e.hints]
+        for _ in range(len(fits)):
+            picked.add(sql.find_candidate("commercials", 16, when).path)
+        assert picked == {entry.path for entry in fits}
+        assert len(sql.backend.play_counts) == len(fits)
+
+    def test_lookups_agree_with_memory(self, db_path):
+        (memory, sql) = self.load()
+        for tag in ["commercials", "bumps"]:
+            assert [e.path for e in sql.get_all_by_tag(tag)] == [e.path for e in memory.get_all_by_tag(tag)]
+        assert sql.get_all_by_tag("missing") is None
+
+        for path in ["catalog/bumps/3.mp4", "catalog/commercials/007.mp4"]:
+            expected = memory.entry_by_fpath(path)
+            found = sql.entry_by_fpath(path)
+            assert (found.path, found.tag, found.duration, found.count) == (
+                expected.path,
+                expected.tag,
+                expected.duration,
+                expected.count,
+            )
+        assert sql.entry_by_fpath("catalog/nothing.mp4") is None
+
+    def test_signoff_and_summary(self, db_path):
+        (memory, sql) = self.load()
+        assert [e.path for e in sql.get_signoff()] == [e.path for e in memory.get_signoff()] == ["catalog/sign_off.mp4"]
+        for catalog in (memory, sql):
+            catalog._build_tags()
+        assert sql.summary_data() == memory.summary_data() == (3, 126)